@@ -7,15 +7,123 @@ Proporciona funciones para identificar dispositivos de entrada/salida
 y especialmente para encontrar dispositivos loopback para grabar audio del sistema.
 """
 
+import re
 import sys
+import time
 import platform
-from typing import Dict, List, Optional, Any
+import threading
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Any
 
-try:
-    import sounddevice as sd
-except ImportError:
-    print("Error: No se pudo importar sounddevice. Instale con 'pip install sounddevice'")
-    # No fallamos aquí para permitir usar partes de la aplicación sin audio
+# sounddevice carga PortAudio al importarse, así que se importa en el primer uso.
+# Si no está instalado, las funciones fallan de forma controlada y el resto
+# de la aplicación puede usarse sin audio.
+_sd = None
+
+def _get_sd():
+    """Importa sounddevice en el primer uso y reutiliza el módulo."""
+    global _sd
+    if _sd is None:
+        try:
+            import sounddevice
+        except ImportError:
+            print("Error: No se pudo importar sounddevice. Instale con 'pip install sounddevice'")
+            raise
+        _sd = sounddevice
+    return _sd
+
+# Nombres habituales de los dispositivos loopback en Windows, por prioridad
+LOOPBACK_KEYWORDS = ('stereo mix', 'what u hear', 'wave out', 'mix', 'loopback')
+
+# Patrones precompilados (sin distinguir mayúsculas) para detectar el loopback:
+# uno por palabra clave de Windows, en orden de prioridad (un 'Stereo Mix' gana
+# a cualquier nombre que solo contenga 'mix'), y las fuentes "Monitor of ..."
+# de PulseAudio en Linux
+_LOOPBACK_PATTERNS = tuple(re.compile(re.escape(keyword), re.IGNORECASE)
+                           for keyword in LOOPBACK_KEYWORDS)
+_MONITOR_PATTERNS = (re.compile('monitor', re.IGNORECASE),)
+
+# Segundos durante los que la enumeración en caché se considera vigente; pasado
+# ese tiempo la siguiente consulta vuelve a enumerar. PortAudio no se reinicia
+# aquí (no es seguro entre hilos): los dispositivos conectados después del
+# arranque aparecen al pulsar "Dispositivos" (invalidate_audio_cache(True))
+DEVICE_CACHE_TTL = 30.0
+_cache_timestamp = 0.0
+
+# PortAudio no es seguro entre hilos: las enumeraciones (ejecutor del Recorder,
+# DeviceRefreshWorker) y el reinicio de invalidate_audio_cache(True) se serializan
+# con este lock, para no terminar PortAudio mientras otro hilo lo consulta
+_portaudio_lock = threading.RLock()
+
+class AudioDevice(NamedTuple):
+    """Datos de un dispositivo de audio que usan las listas de selección."""
+    index: int
+    name: str
+    hostapi_name: str
+    max_in: int
+    max_out: int
+    default_sr: float
+
+@lru_cache(maxsize=1)
+def _cached_devices() -> tuple[dict[str, Any], ...]:
+    """
+    Enumera los dispositivos de PortAudio una sola vez (hasta que caduca la caché).
+    Cada llamada a sd.query_devices() recorre todos los dispositivos del sistema.
+    """
+    global _cache_timestamp
+    with _portaudio_lock:
+        devices = tuple(dict(device) for device in _get_sd().query_devices())
+    _cache_timestamp = time.monotonic()
+    return devices
+
+def _expire_stale_cache() -> None:
+    """Descarta la enumeración en caché si tiene más de DEVICE_CACHE_TTL segundos."""
+    if _cache_timestamp and time.monotonic() - _cache_timestamp > DEVICE_CACHE_TTL:
+        invalidate_audio_cache()
+
+@lru_cache(maxsize=1)
+def _cached_hostapis() -> tuple[dict[str, Any], ...]:
+    """Enumera las APIs de audio del sistema (MME, WASAPI, ALSA...) una sola vez."""
+    with _portaudio_lock:
+        return tuple(dict(hostapi) for hostapi in _get_sd().query_hostapis())
+
+@lru_cache(maxsize=1)
+def _cached_device_index() -> dict[str, dict[str, Any]]:
+    """
+    Construye el índice de búsqueda por nombre sobre la enumeración en caché.
+    
+    Returns:
+        dict: {nombre en minúsculas: dispositivo} (el primero gana si hay
+              nombres repetidos).
+    """
+    name_to_device: dict[str, dict[str, Any]] = {}
+    for device in _cached_devices():
+        name_to_device.setdefault(device.get('name', '').lower(), device)
+    return name_to_device
+
+def invalidate_audio_cache(reinitialize: bool = False) -> None:
+    """
+    Descarta la enumeración de dispositivos en caché.
+    
+    Args:
+        reinitialize (bool): Si es True, reinicia PortAudio para que detecte
+                             dispositivos conectados o desconectados después
+                             de la primera enumeración.
+    """
+    global _cache_timestamp
+    with _portaudio_lock:
+        # Si sounddevice aún no se ha importado, PortAudio no está inicializado
+        if reinitialize and _sd is not None:
+            try:
+                _sd._terminate()
+                _sd._initialize()
+            except Exception as e:
+                print(f"Error al reiniciar PortAudio: {e}")
+        _cache_timestamp = 0.0
+        _cached_devices.cache_clear()
+        _cached_hostapis.cache_clear()
+        _cached_device_index.cache_clear()
+        _cached_audio_devices.cache_clear()
 
 def get_all_audio_devices() -> List[Dict[str, Any]]:
     """
@@ -24,13 +132,58 @@ def get_all_audio_devices() -> List[Dict[str, Any]]:
     Returns:
         List[Dict[str, Any]]: Lista de diccionarios con información de los dispositivos.
     """
+    _expire_stale_cache()
     try:
-        devices = sd.query_devices()
-        return devices if isinstance(devices, list) else [devices]
+        return list(_cached_devices())
     except Exception as e:
         print(f"Error al obtener dispositivos de audio: {e}")
         return []
 
+@lru_cache(maxsize=1)
+def _cached_audio_devices() -> tuple[tuple[AudioDevice, ...], tuple[AudioDevice, ...]]:
+    """Construye en una sola pasada las tuplas de dispositivos de entrada y salida."""
+    hostapis = _cached_hostapis()
+    inputs: list[AudioDevice] = []
+    outputs: list[AudioDevice] = []
+    for index, device in enumerate(_cached_devices()):
+        max_in = device.get('max_input_channels', 0)
+        max_out = device.get('max_output_channels', 0)
+        is_input = max_in > 0
+        is_output = max_out > 0
+        if not (is_input or is_output):
+            continue
+        hostapi = device.get('hostapi', -1)
+        hostapi_name = hostapis[hostapi].get('name', '') if 0 <= hostapi < len(hostapis) else ''
+        audio_device = AudioDevice(
+            index=device.get('index', index),
+            name=device.get('name', ''),
+            hostapi_name=hostapi_name,
+            max_in=max_in,
+            max_out=max_out,
+            default_sr=device.get('default_samplerate', 0.0),
+        )
+        if is_input:
+            inputs.append(audio_device)
+        if is_output:
+            outputs.append(audio_device)
+    return tuple(inputs), tuple(outputs)
+
+def list_audio_devices() -> dict[str, list[AudioDevice]]:
+    """
+    Separa los dispositivos de audio en entradas y salidas.
+    Un dispositivo dúplex aparece en ambas listas.
+    
+    Returns:
+        dict[str, list[AudioDevice]]: Diccionario con las claves 'input' y 'output'.
+    """
+    _expire_stale_cache()
+    try:
+        inputs, outputs = _cached_audio_devices()
+    except Exception as e:
+        print(f"Error al obtener dispositivos de audio: {e}")
+        return {"input": [], "output": []}
+    return {"input": list(inputs), "output": list(outputs)}
+
 def get_default_device_info(kind: str = 'input') -> Optional[Dict[str, Any]]:
     """
     Obtiene información sobre el dispositivo de audio predeterminado.
@@ -44,11 +197,13 @@ def get_default_device_info(kind: str = 'input') -> Optional[Dict[str, Any]]:
     if kind not in ('input', 'output'):
         raise ValueError("'kind' debe ser 'input' o 'output'")
     
+    _expire_stale_cache()
     try:
-        device_id = sd.default.device[0 if kind == 'input' else 1]
-        if device_id is not None:
-            device_info = sd.query_devices(device=device_id)
-            return device_info
+        with _portaudio_lock:
+            device_id = _get_sd().default.device[0 if kind == 'input' else 1]
+        # PortAudio usa -1 cuando no hay dispositivo predeterminado
+        if device_id is not None and device_id >= 0:
+            return _cached_devices()[device_id]
     except Exception as e:
         print(f"Error al obtener dispositivo {kind} predeterminado: {e}")
     
@@ -58,6 +213,9 @@ def print_audio_devices() -> None:
     """Muestra por consola todos los dispositivos de audio disponibles."""
     try:
         devices = get_all_audio_devices()
+        hostapis = _cached_hostapis()
+        with _portaudio_lock:
+            default_input, default_output = _get_sd().default.device
         print("\n=== Dispositivos de Audio Disponibles ===")
         for i, dev in enumerate(devices):
             # Manejar diferentes tipos de objetos de dispositivo
@@ -80,9 +238,9 @@ def print_audio_devices() -> None:
             
             default_mark = ""
             
-            if i == sd.default.device[0]:
+            if i == default_input:
                 default_mark += "[Entrada Default] "
-            if i == sd.default.device[1]:
+            if i == default_output:
                 default_mark += "[Salida Default] "
                 
             dev_type = []
@@ -93,6 +251,8 @@ def print_audio_devices() -> None:
                 
             print(f"ID: {i}, {default_mark}Nombre: {name}")
             print(f"    Tipo: {', '.join(dev_type)}")
+            if isinstance(host_api, int) and 0 <= host_api < len(hostapis):
+                host_api = hostapis[host_api].get('name', host_api)
             print(f"    API: {host_api}")
     except Exception as e:
         print(f"Error al imprimir dispositivos de audio: {e}")
@@ -106,43 +266,32 @@ def find_loopback_device_info() -> Optional[Dict[str, Any]]:
     Returns:
         Optional[Dict[str, Any]]: Información del dispositivo loopback o None si no se encuentra.
     """
+    _expire_stale_cache()
     try:
-        devices = get_all_audio_devices()
+        is_windows = sys.platform == 'win32'
+        is_linux = sys.platform.startswith('linux')
         
-        # Términos de búsqueda para encontrar dispositivos loopback
-        search_terms = ['stereo mix', 'what u hear', 'wave out', 'mix', 'loopback']
-        
-        system = platform.system().lower()
+        # En Windows, buscar nombres comunes de loopback;
+        # en Linux con PulseAudio, buscar dispositivos "Monitor of"
+        if is_windows:
+            patterns = _LOOPBACK_PATTERNS
+        elif is_linux:
+            patterns = _MONITOR_PATTERNS
+        else:
+            patterns = ()
         
-        # Búsqueda específica por plataforma
-        for device in devices:
-            # Comprobar el tipo de device y manejarlo apropiadamente
-            if isinstance(device, dict):
-                # Si es un diccionario, usamos get() como estaba previsto
-                name = device.get('name', '').lower()
-                max_input_channels = device.get('max_input_channels', 0)
-            else:
-                # Si es un objeto DeviceList, accedemos a los atributos directamente
-                try:
-                    name = getattr(device, 'name', '').lower()
-                    max_input_channels = getattr(device, 'max_input_channels', 0)
-                except Exception as e:
-                    print(f"Error al acceder a atributos del dispositivo: {e}")
-                    continue
-            
-            # En Windows, buscar nombres comunes de loopback
-            if system == 'windows':
-                if any(term in name for term in search_terms):
-                    if max_input_channels > 0:  # Debe tener canales de entrada
-                        return device
-            
-            # En Linux con PulseAudio, buscar dispositivos "Monitor of"
-            elif system == 'linux':
-                if ('monitor' in name or '.monitor' in name) and max_input_channels > 0:
+        # Debe tener canales de entrada
+        inputs = [device for device in _cached_devices()
+                  if device.get('max_input_channels', 0) > 0]
+        # Patrones en orden de prioridad: el primero que coincida con algún
+        # dispositivo decide
+        for pattern in patterns:
+            for device in inputs:
+                if pattern.search(device.get('name', '')):
                     return device
         
         # No se encontró un dispositivo específico
-        if system == 'linux':
+        if is_linux:
             print("\nAVISO: No se encontró dispositivo para capturar audio del sistema.")
             print("Para habilitar este dispositivo en Linux:")
             print("1. Abre 'pavucontrol' (Instalalo con: sudo apt install pavucontrol)")
@@ -150,7 +299,7 @@ def find_loopback_device_info() -> Optional[Dict[str, Any]]:
             print("3. Cambia 'Mostrar:' a 'Todos los dispositivos de entrada'")
             print("4. Debería aparecer 'Monitor of...' para cada salida de audio")
             print("5. Asegúrate de que no esté silenciado\n")
-        elif system == 'windows':
+        elif is_windows:
             print("\nAVISO: No se encontró dispositivo para capturar audio del sistema.")
             print("Para habilitar 'Stereo Mix' en Windows:")
             print("1. Haz clic derecho en el icono de sonido en la barra de tareas")
@@ -176,25 +325,13 @@ def get_device_by_name(name: str) -> Optional[Dict[str, Any]]:
     """
     if not name:
         return None
-        
-    devices = get_all_audio_devices()
-    name_lower = name.lower()
-    
-    for device in devices:
-        # Manejar tanto diccionarios como objetos DeviceList
-        if isinstance(device, dict):
-            device_name = device.get('name', '')
-        else:
-            try:
-                device_name = getattr(device, 'name', '')
-            except Exception as e:
-                print(f"Error al acceder al nombre del dispositivo: {e}")
-                continue
-                
-        if device_name.lower() == name_lower:
-            return device
     
-    return None
+    _expire_stale_cache()
+    try:
+        return _cached_device_index().get(name.lower())
+    except Exception as e:
+        print(f"Error al buscar dispositivo por nombre: {e}")
+        return None
 
 if __name__ == "__main__":
     # Código de prueba para desarrollo
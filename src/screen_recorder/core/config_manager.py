@@ -6,86 +6,255 @@ Gestor de configuración para el Capturador de Audio y Video.
 Maneja la carga y guardado de preferencias del usuario.
 """
 
+import atexit
+import contextlib
 import json
 import os
+import re
+import sys
 import logging
+import subprocess
+import tempfile
+import threading
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Optional
+from types import MappingProxyType
+from datetime import datetime
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import orjson
+except ImportError:
+    # orjson es opcional: si no está instalado se usa json de la biblioteca estándar
+    orjson = None
+
+
+def json_loads(data: bytes) -> Any:
+    """Decodifica JSON desde bytes, con orjson si está disponible."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj: Any) -> bytes:
+    """Codifica a JSON en bytes UTF-8, con orjson si está disponible."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+def get_config_dir() -> str:
+    """Obtiene el directorio de configuración según la plataforma."""
+    if os.name == 'nt':  # Windows
+        return os.path.join(os.environ.get('APPDATA', ''), 'ScreenRecorder')
+    # Linux/Mac
+    return os.path.join(os.path.expanduser('~'), '.config', 'screen-recorder')
+
+
+# Presets de calidad predefinidos; se construyen una sola vez y son de solo lectura
+QUALITY_PRESETS: Mapping[str, Mapping[str, Any]] = MappingProxyType({
+    "baja": MappingProxyType({
+        "video_codec": "libx264",
+        "preset": "veryfast",
+        "crf": "28",
+        "framerate": 15,
+        "audio_bitrate": "96k",
+    }),
+    "media": MappingProxyType({
+        "video_codec": "libx264",
+        "preset": "medium",
+        "crf": "23",
+        "framerate": 30,
+        "audio_bitrate": "128k",
+    }),
+    "alta": MappingProxyType({
+        "video_codec": "libx264",
+        "preset": "medium",
+        "crf": "18",
+        "framerate": 30,
+        "audio_bitrate": "192k",
+    }),
+    "ultra": MappingProxyType({
+        "video_codec": "libx264",
+        "preset": "slow",
+        "crf": "16",
+        "framerate": 60,
+        "audio_bitrate": "256k",
+    }),
+})
+
+
+DEFAULT_FILENAME_TEMPLATE = "grabacion_%Y%m%d_%H%M%S.mp4"
+
+_STRFTIME_DIRECTIVE_RE = re.compile(r'(%[A-Za-z%])')
+
+# Línea de 'ffmpeg -list_devices' con el nombre alternativo de un dispositivo dshow
+_ALTNAME_RE = re.compile(r'Alternative name\s+"([^"]+)"')
+# Línea "Name: ..." de cada fuente en 'pactl list sources'
+_PACTL_NAME_RE = re.compile(r'^\s*Name:\s*(\S+)', re.MULTILINE)
+
+# Entorno para las herramientas de audio, construido una sola vez. Se hereda
+# todo (pactl necesita XDG_RUNTIME_DIR, PULSE_SERVER, DBUS...) pero con la
+# localización C para que la salida que se analiza no dependa del idioma.
+_SUBPROC_ENV = {**os.environ, "LC_ALL": "C", "LANG": "C"}
+
+
+@lru_cache(maxsize=8)
+def compile_filename_template(template: str) -> Callable[[datetime], str]:
+    """
+    Convierte una plantilla strftime en una función dt -> nombre de archivo.
+    
+    La plantilla se analiza una sola vez: "grabacion_%Y%m%d_%H%M%S.mp4" pasa a
+    ser "grabacion_{0:%Y%m%d}_{0:%H%M%S}.mp4" y cada llamada solo formatea.
+    """
+    pieces = []
+    directives = ''
+    for part in _STRFTIME_DIRECTIVE_RE.split(template):
+        if not part:
+            continue
+        if _STRFTIME_DIRECTIVE_RE.fullmatch(part) and part != '%%':
+            # Directivas consecutivas se agrupan en un solo campo de formato
+            directives += part
+            continue
+        if directives:
+            pieces.append('{0:' + directives + '}')
+            directives = ''
+        literal = '%' if part == '%%' else part
+        pieces.append(literal.replace('{', '{{').replace('}', '}}'))
+    if directives:
+        pieces.append('{0:' + directives + '}')
+    return ''.join(pieces).format
+
+
+@lru_cache(maxsize=1)
+def _get_config_file() -> str:
+    """Ruta de config.json; el directorio se crea una sola vez por proceso."""
+    config_dir = get_config_dir()
+    os.makedirs(config_dir, exist_ok=True)
+    return os.path.join(config_dir, 'config.json')
 
 
 class ConfigManager:
-    """Gestiona la configuración del grabador de pantalla."""
+    """
+    Gestiona la configuración del grabador de pantalla.
+    
+    Hay una sola instancia por archivo de configuración: construir otro
+    ConfigManager con la misma ruta devuelve el existente sin releer el JSON.
+    """
+    
+    # Valores por defecto para una grabación de alta calidad (compartidos por todas las instancias)
+    DEFAULT_CONFIG: dict[str, Any] = {
+        # Configuración de video
+        "video_codec": "auto",          # Códec H.264 ('auto' = GPU si funciona, si no libx264)
+        "preset": "ultrafast",          # Mínimo coste de CPU (captura en tiempo real)
+        "tune": "zerolatency",          # Sin lookahead ni B-frames
+        "crf": "18",                    # Factor de tasa constante (18-23 es alta calidad)
+        "framerate": 30,                # Cuadros por segundo
+        "pixfmt": "yuv420p",            # Formato de pixel (compatibilidad)
+        "linux_capture": "auto",        # x11grab, kmsgrab, pipewire o auto (según sesión)
+        "windows_capture": "auto",      # gdigrab, ddagrab o auto (ddagrab con NVENC/AMF)
+        "thread_queue_size": 1024,      # Paquetes en cola por entrada de FFmpeg
+        "rtbufsize": "256M",            # Buffer de tiempo real (gdigrab/dshow)
+        
+        # Configuración de audio
+        "audio_codec": "aac",           # Códec de audio AAC (alta compatibilidad)
+        "audio_bitrate": "192k",        # Bitrate de audio (calidad alta)
+        "audio_mix_mode": "merge",      # 'merge' (amerge+pan) o 'amix' (fuentes con formatos distintos)
+        "record_mic": True,             # Grabar micrófono por defecto
+        "record_loopback": True,        # Grabar audio del sistema por defecto
+        
+        # Configuración de dispositivos (específico de plataforma)
+        "mic_device": "",               # Se detectará automáticamente
+        "loopback_device": "",          # Se detectará automáticamente
+        
+        # Configuración de salida
+        "output_dir": str(Path.home() / "Videos"),  # Directorio por defecto
+        "filename_template": DEFAULT_FILENAME_TEMPLATE,  # Formato de nombre
+        "save_thumbnail": False,        # Guardar el primer frame como <video>.png
+        
+        # Configuración de la interfaz
+        "timer_refresh_ms": 250         # Intervalo del temporizador de grabación
+    }
+    
+    _instances: dict[str, "ConfigManager"] = {}
+    _instances_lock = threading.Lock()
+    
+    def __new__(cls, config_file: Optional[str] = None):
+        key = os.path.abspath(config_file or _get_config_file())
+        with cls._instances_lock:
+            instance = cls._instances.get(key)
+            if instance is None:
+                instance = super().__new__(cls)
+                instance._initialized = False
+                cls._instances[key] = instance
+        return instance
     
     def __init__(self, config_file: Optional[str] = None):
+        if self._initialized:
+            return
+        self._initialized = True
         self.logger = logging.getLogger('screen_recorder.config')
         
-        # Valores por defecto para una grabación de alta calidad
-        self.default_config = {
-            # Configuración de video
-            "video_codec": "libx264",       # Códec H.264 (alta compatibilidad)
-            "preset": "medium",             # Balance entre calidad y velocidad
-            "crf": "18",                    # Factor de tasa constante (18-23 es alta calidad)
-            "framerate": 30,                # Cuadros por segundo
-            "pixfmt": "yuv420p",            # Formato de pixel (compatibilidad)
-            
-            # Configuración de audio
-            "audio_codec": "aac",           # Códec de audio AAC (alta compatibilidad)
-            "audio_bitrate": "192k",        # Bitrate de audio (calidad alta)
-            "record_mic": True,             # Grabar micrófono por defecto
-            "record_loopback": True,        # Grabar audio del sistema por defecto
-            
-            # Configuración de dispositivos (específico de plataforma)
-            "mic_device": "",               # Se detectará automáticamente
-            "loopback_device": "",          # Se detectará automáticamente
-            
-            # Configuración de salida
-            "output_dir": str(Path.home() / "Videos"),  # Directorio por defecto
-            "filename_template": "grabacion_%Y%m%d_%H%M%S.mp4"  # Formato de nombre
-        }
-        
         # Opcionalmente sobrescribir con archivo externo
         self.config_file = config_file or self._get_default_config_path()
         self.config = self._load_config()
         
+        # Caché de dispositivos de audio (se invalida con invalidate_audio_devices)
+        self._audio_devices_cache: Optional[dict[str, list]] = None
+        self._audio_devices_lock = threading.Lock()
+        self._device_watcher: Optional[Any] = None  # Proceso 'pactl subscribe' (Linux)
+        
     def _get_default_config_path(self) -> str:
         """Obtiene la ruta del archivo de configuración según la plataforma."""
-        if os.name == 'nt':  # Windows
-            config_dir = os.path.join(os.environ.get('APPDATA', ''), 'ScreenRecorder')
-        else:  # Linux/Mac
-            config_dir = os.path.join(os.path.expanduser('~'), '.config', 'screen-recorder')
-            
-        os.makedirs(config_dir, exist_ok=True)
-        return os.path.join(config_dir, 'config.json')
+        return _get_config_file()
     
     def _load_config(self) -> Dict[str, Any]:
         """Carga la configuración del archivo, o crea uno nuevo con valores predeterminados."""
-        config = self.default_config.copy()
+        config = self.DEFAULT_CONFIG.copy()
         
         try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    user_config = json.load(f)
-                    # Actualizar configuración con valores del usuario
-                    config.update(user_config)
-                self.logger.info(f"Configuración cargada desde: {self.config_file}")
-            else:
-                self._save_config(config)
-                self.logger.info(f"Configuración predeterminada creada en: {self.config_file}")
+            # Abrir directamente: un solo acceso al disco en lugar de exists() + open()
+            with open(self.config_file, 'rb') as f:
+                user_config = json_loads(f.read())
+            # Actualizar configuración con valores del usuario
+            config.update(user_config)
+            self.logger.info(f"Configuración cargada desde: {self.config_file}")
+        except FileNotFoundError:
+            self._save_config(config)
+            self.logger.info(f"Configuración predeterminada creada en: {self.config_file}")
         except Exception as e:
             self.logger.error(f"Error al cargar la configuración: {e}")
         
         return config
     
     def _save_config(self, config: Dict[str, Any]) -> bool:
-        """Guarda la configuración en el archivo."""
+        """
+        Guarda la configuración en el archivo.
+        
+        Se escribe en un archivo temporal del mismo directorio y se sustituye el
+        original con os.replace (atómico), para que una interrupción a mitad de
+        escritura no deje un config.json truncado.
+        """
+        tmp_path = None
         try:
-            os.makedirs(os.path.dirname(self.config_file), exist_ok=True)
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=4, ensure_ascii=False)
+            config_dir = os.path.dirname(self.config_file)
+            os.makedirs(config_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                'wb', dir=config_dir, prefix='.config-', suffix='.tmp', delete=False
+            ) as f:
+                tmp_path = f.name
+                f.write(json_dumps(config))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.config_file)
             self.logger.info(f"Configuración guardada en: {self.config_file}")
             return True
         except Exception as e:
             self.logger.error(f"Error al guardar la configuración: {e}")
+            if tmp_path:
+                with contextlib.suppress(OSError):
+                    os.unlink(tmp_path)
             return False
     
     def get(self, key: str, default: Any = None) -> Any:
@@ -100,60 +269,92 @@ class ConfigManager:
         """Guarda la configuración actual."""
         return self._save_config(self.config)
     
+    def compile_filename_template(self) -> Callable[[datetime], str]:
+        """Devuelve la función que genera nombres con la plantilla configurada."""
+        return compile_filename_template(self.config.get("filename_template", DEFAULT_FILENAME_TEMPLATE))
+    
     def reset_to_defaults(self) -> None:
         """Restablece la configuración a valores predeterminados."""
-        self.config = self.default_config.copy()
-    
-    def get_quality_presets(self) -> Dict[str, Dict[str, Any]]:
-        """Devuelve presets de calidad predefinidos."""
-        return {
-            "baja": {
-                "video_codec": "libx264",
-                "preset": "veryfast",
-                "crf": "28",
-                "framerate": 15,
-                "audio_bitrate": "96k",
-            },
-            "media": {
-                "video_codec": "libx264",
-                "preset": "medium",
-                "crf": "23",
-                "framerate": 30,
-                "audio_bitrate": "128k",
-            },
-            "alta": {
-                "video_codec": "libx264",
-                "preset": "medium",
-                "crf": "18",
-                "framerate": 30,
-                "audio_bitrate": "192k",
-            },
-            "ultra": {
-                "video_codec": "libx264",
-                "preset": "slow",
-                "crf": "16",
-                "framerate": 60,
-                "audio_bitrate": "256k",
-            }
-        }
+        self.config = self.DEFAULT_CONFIG.copy()
+    
+    def get_quality_presets(self) -> Mapping[str, Mapping[str, Any]]:
+        """Devuelve presets de calidad predefinidos (solo lectura)."""
+        return QUALITY_PRESETS
     
     def apply_quality_preset(self, preset_name: str) -> bool:
         """Aplica un preset de calidad predefinido."""
-        presets = self.get_quality_presets()
-        if preset_name in presets:
-            for key, value in presets[preset_name].items():
-                self.config[key] = value
-            return True
-        return False
+        preset = QUALITY_PRESETS.get(preset_name)
+        if preset is None:
+            return False
+        self.config.update(preset)
+        return True
 
     def get_audio_devices(self) -> Dict[str, list]:
         """
         Obtiene los dispositivos de audio disponibles en el sistema.
         Devuelve un diccionario con listas de micrófonos y dispositivos de loopback.
+        
+        El resultado se guarda en caché: enumerar lanza procesos externos
+        (ffmpeg, pactl, arecord). En Linux se vigilan los cambios de fuentes de
+        PulseAudio para invalidarla; en el resto hay que llamar a
+        invalidate_audio_devices() cuando el usuario pida actualizar.
+        """
+        with self._audio_devices_lock:
+            if self._audio_devices_cache is None:
+                self._audio_devices_cache = self._detect_audio_devices()
+                self._start_device_watcher()
+            cache = self._audio_devices_cache
+        return {kind: list(devices) for kind, devices in cache.items()}
+    
+    def invalidate_audio_devices(self) -> None:
+        """Descarta la lista de dispositivos de audio en caché."""
+        with self._audio_devices_lock:
+            self._audio_devices_cache = None
+    
+    def _start_device_watcher(self) -> None:
+        """
+        En Linux, lanza 'pactl subscribe' una sola vez y lee sus eventos en un
+        hilo daemon para invalidar la caché al añadir, cambiar o quitar fuentes.
         """
-        import subprocess
-        import sys
+        if self._device_watcher is not None or not sys.platform.startswith("linux"):
+            return
+        try:
+            self._device_watcher = subprocess.Popen(
+                ["pactl", "subscribe"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                env=_SUBPROC_ENV
+            )
+        except OSError as e:
+            self.logger.warning(f"No se pudo vigilar cambios de dispositivos de audio: {e}")
+            return
         
+        threading.Thread(
+            target=self._watch_device_events,
+            args=(self._device_watcher.stdout,),
+            name="pactl-subscribe",
+            daemon=True
+        ).start()
+    
+    def _watch_device_events(self, stream) -> None:
+        """Lee eventos de 'pactl subscribe' (p. ej. "Event 'new' on source #5")."""
+        for line in stream:
+            if " on source " in line and ("'new'" in line or "'change'" in line or "'remove'" in line):
+                self.invalidate_audio_devices()
+        # pactl terminó (p. ej. PulseAudio reiniciado): no se puede seguir confiando en la caché
+        self.invalidate_audio_devices()
+        self._device_watcher = None
+    
+    def stop_device_watcher(self) -> None:
+        """Detiene el proceso 'pactl subscribe' si está en ejecución."""
+        watcher = self._device_watcher
+        if watcher is not None:
+            watcher.terminate()
+            self._device_watcher = None
+    
+    def _detect_audio_devices(self) -> dict[str, list]:
+        """Enumera los dispositivos de audio con las herramientas del sistema."""
         result = {
             "microphones": [],
             "loopback": []
@@ -161,20 +362,31 @@ class ConfigManager:
         
         try:
             if sys.platform == "win32":
-                # En Windows, usar ffmpeg para listar dispositivos DirectShow
+                # En Windows, usar ffmpeg para listar dispositivos DirectShow.
+                # La lista sale por stderr y se analiza línea a línea según llega
+                # (ffmpeg termina con error por la entrada 'dummy', es lo esperado)
                 cmd = ["ffmpeg", "-list_devices", "true", "-f", "dshow", "-i", "dummy"]
-                output = subprocess.check_output(cmd, stderr=subprocess.STDOUT, text=True)
-                
-                # Analizar salida para encontrar dispositivos
-                audio_section = False
-                for line in output.splitlines():
-                    if "DirectShow audio devices" in line:
-                        audio_section = True
-                        continue
-                    if audio_section and "Alternative name" in line:
-                        device_name = line.split('"')[1]
+                with subprocess.Popen(
+                    cmd,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    errors="replace",
+                    env=_SUBPROC_ENV
+                ) as proc:
+                    audio_section = False
+                    for line in proc.stderr:
+                        if not audio_section:
+                            audio_section = "DirectShow audio devices" in line
+                            continue
+                        match = _ALTNAME_RE.search(line)
+                        if match is None:
+                            continue
+                        device_name = match.group(1)
+                        name_lower = device_name.lower()
                         # Estéreo Mix suele ser el dispositivo de loopback
-                        if "mix" in device_name.lower() or "loopback" in device_name.lower():
+                        if "mix" in name_lower or "loopback" in name_lower:
                             result["loopback"].append(device_name)
                         else:
                             result["microphones"].append(device_name)
@@ -182,27 +394,21 @@ class ConfigManager:
             elif sys.platform.startswith("linux"):
                 # En Linux, usar pactl (PulseAudio) para listar dispositivos
                 try:
-                    cmd = ["pactl", "list", "sources"]
-                    output = subprocess.check_output(cmd, text=True)
-                    
-                    current_device = None
-                    for line in output.splitlines():
-                        if line.strip().startswith("Name:"):
-                            current_device = line.split("Name:")[1].strip()
-                        # Buscar descripciones de dispositivos
-                        if line.strip().startswith("Description:"):
-                            description = line.split("Description:")[1].strip()
-                            # Monitor = dispositivo de loopback
-                            if "monitor" in current_device.lower():
-                                result["loopback"].append(current_device)
-                            else:
-                                result["microphones"].append(current_device)
+                    for name in self._list_pulse_sources():
+                        # Monitor = dispositivo de loopback
+                        if "monitor" in name.lower():
+                            result["loopback"].append(name)
+                        else:
+                            result["microphones"].append(name)
                 except:
                     # Alternativa: intentar usar ALSA
                     try:
                         cmd = ["arecord", "-L"]
-                        output = subprocess.check_output(cmd, text=True)
-                        for line in output.splitlines():
+                        proc = subprocess.run(cmd, capture_output=True, text=True,
+                                              env=_SUBPROC_ENV, check=False)
+                        if proc.returncode != 0:
+                            raise subprocess.CalledProcessError(proc.returncode, cmd)
+                        for line in proc.stdout.splitlines():
                             if not line.startswith(" ") and line != "":
                                 if "loopback" in line.lower():
                                     result["loopback"].append(line)
@@ -214,4 +420,141 @@ class ConfigManager:
         except Exception as e:
             self.logger.error(f"Error al obtener dispositivos de audio: {e}")
         
-        return result
\ No newline at end of file
+        return result
+    
+    @staticmethod
+    def _list_pulse_sources() -> list:
+        """
+        Devuelve los nombres de las fuentes de PulseAudio.
+        Usa la salida JSON de pactl (>= 16) y, si no está disponible, la de texto.
+        """
+        proc = subprocess.run(["pactl", "-f", "json", "list", "sources"],
+                              capture_output=True, env=_SUBPROC_ENV, check=False)
+        if proc.returncode == 0:
+            try:
+                return [source["name"] for source in json_loads(proc.stdout)]
+            except (ValueError, KeyError, TypeError):
+                pass
+        
+        cmd = ["pactl", "list", "sources"]
+        proc = subprocess.run(cmd, capture_output=True, text=True,
+                              env=_SUBPROC_ENV, check=False)
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+        output = proc.stdout
+        return _PACTL_NAME_RE.findall(output)
+
+
+# --- API a nivel de módulo (usada por la GUI) ---
+# Un único ConfigManager por proceso; el diccionario se relee del disco solo
+# si el mtime de config.json cambia, y las escrituras rápidas se agrupan.
+
+SAVE_DEBOUNCE_SECONDS = 0.5
+
+_default_manager: Optional[ConfigManager] = None
+_CONFIG_CACHE: Optional[dict[str, Any]] = None
+_CONFIG_MTIME: Optional[int] = None
+_config_lock = threading.RLock()
+_save_timer: Optional[threading.Timer] = None
+# Claves cambiadas con set_config_value que aún no se han escrito en disco
+_pending_keys: set = set()
+
+
+def _stat_mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def get_config_path() -> str:
+    """Ruta del archivo de configuración del usuario."""
+    return _get_config_file()
+
+
+def load_config() -> dict[str, Any]:
+    """
+    Devuelve la configuración en memoria, releyendo config.json solo si
+    cambió en disco desde la última lectura o escritura.
+    
+    Siempre se devuelve el mismo diccionario: al releer se actualiza en su
+    sitio, de modo que quien guardó una referencia (la ventana, el Recorder)
+    ve los cambios. Los valores de set_config_value aún sin guardar se
+    conservan sobre los leídos del disco.
+    """
+    global _default_manager, _CONFIG_CACHE, _CONFIG_MTIME
+    with _config_lock:
+        path = get_config_path()
+        mtime = _stat_mtime(path)
+        if _CONFIG_CACHE is not None and mtime == _CONFIG_MTIME:
+            return _CONFIG_CACHE
+        
+        if _default_manager is None:
+            _default_manager = ConfigManager(path)
+        else:
+            _default_manager.config = _default_manager._load_config()
+        fresh = _default_manager.config
+        if _CONFIG_CACHE is None:
+            _CONFIG_CACHE = fresh
+        else:
+            pending = {key: _CONFIG_CACHE[key] for key in _pending_keys if key in _CONFIG_CACHE}
+            _CONFIG_CACHE.clear()
+            _CONFIG_CACHE.update(fresh)
+            _CONFIG_CACHE.update(pending)
+            _default_manager.config = _CONFIG_CACHE
+        _CONFIG_MTIME = _stat_mtime(path)
+        return _CONFIG_CACHE
+
+
+def save_config(config: Optional[dict[str, Any]] = None) -> bool:
+    """Guarda la configuración inmediatamente (cancela un guardado pendiente)."""
+    global _CONFIG_CACHE, _CONFIG_MTIME, _save_timer
+    with _config_lock:
+        if _save_timer is not None:
+            _save_timer.cancel()
+            _save_timer = None
+        # load_config() también crea el ConfigManager por defecto si hace falta
+        cached = load_config()
+        if config is not None and config is not cached:
+            # Mantener la identidad del diccionario compartido
+            cached.clear()
+            cached.update(config)
+        _pending_keys.clear()
+        _default_manager.config = cached
+        ok = _default_manager.save()
+        _CONFIG_CACHE = cached
+        _CONFIG_MTIME = _stat_mtime(get_config_path())
+        return ok
+
+
+def flush_config() -> bool:
+    """Escribe ya los cambios pendientes de set_config_value, si los hay."""
+    with _config_lock:
+        if _save_timer is None:
+            return True
+        return save_config(_CONFIG_CACHE)
+
+
+def get_config_value(key: str, default: Any = None) -> Any:
+    """Obtiene un valor de la configuración en memoria."""
+    return load_config().get(key, default)
+
+
+def set_config_value(key: str, value: Any) -> None:
+    """
+    Modifica un valor en memoria y programa el guardado. Varios cambios
+    seguidos se escriben en disco una sola vez tras SAVE_DEBOUNCE_SECONDS.
+    """
+    global _save_timer
+    with _config_lock:
+        load_config()[key] = value
+        _pending_keys.add(key)
+        if _save_timer is not None:
+            _save_timer.cancel()
+        _save_timer = threading.Timer(SAVE_DEBOUNCE_SECONDS, flush_config)
+        _save_timer.daemon = True
+        _save_timer.start()
+
+
+# No perder cambios pendientes al salir de la aplicación
+atexit.register(flush_config)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# src/screen_recorder/core/ffmpeg_probe.py
+
+"""
+Detección de las capacidades del binario de FFmpeg (codificadores,
+formatos y filtros). El resultado se guarda en disco junto con el mtime
+del ejecutable, de modo que solo se vuelve a consultar a FFmpeg cuando
+el binario cambia.
+"""
+
+import logging
+import os
+import shutil
+import subprocess
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from .config_manager import get_config_dir, json_dumps, json_loads
+
+logger = logging.getLogger('screen_recorder.ffmpeg')
+
+CACHE_FILENAME = "ffmpeg_caps.json"
+CACHE_VERSION = 1
+
+# Letras de la columna de banderas en 'ffmpeg -formats'
+# (D = demuxer, E = muxer, d = dispositivo)
+_FORMAT_FLAGS = frozenset("DEd")
+
+
+class FFmpegCapabilities(NamedTuple):
+    """Capacidades de un binario de FFmpeg."""
+    encoders: frozenset[str]
+    formats: frozenset[str]
+    filters: frozenset[str]
+
+
+EMPTY_CAPABILITIES = FFmpegCapabilities(frozenset(), frozenset(), frozenset())
+
+
+def _run_list(ffmpeg_path: str, option: str) -> str:
+    """Ejecuta 'ffmpeg -hide_banner <option>' y devuelve su salida estándar."""
+    result = subprocess.run(
+        [ffmpeg_path, "-hide_banner", option],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return result.stdout
+
+
+def _parse_encoders(output: str) -> frozenset[str]:
+    encoders = set()
+    for line in output.splitlines():
+        # Formato de cada línea: " V....D libx264    descripción"
+        parts = line.split()
+        if (len(parts) >= 2 and len(parts[0]) == 6 and parts[0][0] in "VAS"
+                and parts[1] != "="):
+            encoders.add(parts[1])
+    return frozenset(encoders)
+
+
+def _parse_formats(output: str) -> frozenset[str]:
+    formats = set()
+    started = False
+    for line in output.splitlines():
+        # La tabla empieza tras la línea separadora " --"
+        if not started:
+            started = line.strip().startswith("--")
+            continue
+        # Formato: " D  x11grab   descripción" o " DEd pulse   descripción"
+        for token in line.split():
+            if not set(token) <= _FORMAT_FLAGS:
+                # Algunos formatos agrupan alias: "mov,mp4,m4a,3gp,3g2,mj2"
+                formats.update(token.split(","))
+                break
+    return frozenset(formats)
+
+
+def _parse_filters(output: str) -> frozenset[str]:
+    filters = set()
+    for line in output.splitlines():
+        # Formato: " ... ddagrab           |->V       descripción"
+        parts = line.split()
+        if len(parts) >= 3 and "->" in parts[2]:
+            filters.add(parts[1])
+    return frozenset(filters)
+
+
+def _probe_ffmpeg_caps(ffmpeg_path: str) -> FFmpegCapabilities:
+    """Consulta al binario de FFmpeg sus codificadores, formatos y filtros."""
+    try:
+        return FFmpegCapabilities(
+            encoders=_parse_encoders(_run_list(ffmpeg_path, "-encoders")),
+            formats=_parse_formats(_run_list(ffmpeg_path, "-formats")),
+            filters=_parse_filters(_run_list(ffmpeg_path, "-filters")),
+        )
+    except (subprocess.SubprocessError, OSError) as e:
+        logger.error("Error al consultar las capacidades de FFmpeg: %s", e)
+        return EMPTY_CAPABILITIES
+
+
+def _get_cache_path() -> str:
+    return os.path.join(get_config_dir(), CACHE_FILENAME)
+
+
+def _load_cached(ffmpeg_path: str, mtime_ns: int) -> Optional[FFmpegCapabilities]:
+    """Lee la caché de disco si corresponde al mismo binario y mtime."""
+    try:
+        with open(_get_cache_path(), "rb") as f:
+            data = json_loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+    if (not isinstance(data, dict)
+            or data.get("version") != CACHE_VERSION
+            or data.get("ffmpeg_path") != ffmpeg_path
+            or data.get("mtime_ns") != mtime_ns):
+        return None
+
+    try:
+        return FFmpegCapabilities(
+            encoders=frozenset(data["encoders"]),
+            formats=frozenset(data["formats"]),
+            filters=frozenset(data["filters"]),
+        )
+    except (KeyError, TypeError):
+        return None
+
+
+def _save_cached(ffmpeg_path: str, mtime_ns: int, caps: FFmpegCapabilities) -> None:
+    """Guarda las capacidades en disco (reemplazo atómico del archivo)."""
+    cache_path = _get_cache_path()
+    data = {
+        "version": CACHE_VERSION,
+        "ffmpeg_path": ffmpeg_path,
+        "mtime_ns": mtime_ns,
+        "encoders": sorted(caps.encoders),
+        "formats": sorted(caps.formats),
+        "filters": sorted(caps.filters),
+    }
+    tmp_path = cache_path + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.write(json_dumps(data))
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning("No se pudo guardar la caché de FFmpeg: %s", e)
+
+
+@lru_cache(maxsize=8)
+def get_capabilities(ffmpeg_path: str) -> FFmpegCapabilities:
+    """
+    Obtiene las capacidades del binario de FFmpeg indicado.
+
+    Se usa la caché de disco mientras el mtime del binario no cambie; en
+    caso contrario se vuelve a consultar a FFmpeg y se actualiza la caché.
+
+    Args:
+        ffmpeg_path (str): Ruta al ejecutable de FFmpeg.
+
+    Returns:
+        FFmpegCapabilities: Codificadores, formatos y filtros disponibles.
+    """
+    try:
+        mtime_ns = os.stat(ffmpeg_path).st_mtime_ns
+    except OSError:
+        return EMPTY_CAPABILITIES
+
+    caps = _load_cached(ffmpeg_path, mtime_ns)
+    if caps is None:
+        caps = _probe_ffmpeg_caps(ffmpeg_path)
+        if caps is not EMPTY_CAPABILITIES:
+            _save_cached(ffmpeg_path, mtime_ns, caps)
+    return caps
+
+
+# Codificación de prueba: un frame sintético a la salida nula. Que el
+# codificador esté compilado no garantiza que haya GPU o driver que lo soporte.
+_TEST_INPUT_ARGS = ("-f", "lavfi", "-i", "color=c=black:s=256x256:d=0.1", "-frames:v", "1")
+_VAAPI_TEST_DEVICE = "/dev/dri/renderD128"
+
+
+@lru_cache(maxsize=16)
+def encoder_works(ffmpeg_path: str, encoder: str) -> bool:
+    """
+    Comprueba, codificando un frame de prueba, que el codificador se puede usar.
+
+    El resultado se memoriza durante la vida del proceso (no en disco: depende
+    del hardware y de los drivers, no solo del binario de FFmpeg).
+    """
+    cmd = [ffmpeg_path, "-hide_banner", "-loglevel", "error"]
+    if encoder == "h264_vaapi":
+        cmd += ["-vaapi_device", _VAAPI_TEST_DEVICE, *_TEST_INPUT_ARGS,
+                "-vf", "format=nv12,hwupload"]
+    else:
+        cmd += _TEST_INPUT_ARGS
+    cmd += ["-c:v", encoder, "-f", "null", "-"]
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=10, check=False)
+    except (subprocess.SubprocessError, OSError):
+        return False
+    return result.returncode == 0
+
+
+def _resolve(ffmpeg_path: Optional[str]) -> Optional[str]:
+    return ffmpeg_path or shutil.which("ffmpeg")
+
+
+def has_encoder(name: str, ffmpeg_path: Optional[str] = None) -> bool:
+    """Indica si FFmpeg incluye el codificador indicado (p. ej. 'h264_nvenc')."""
+    path = _resolve(ffmpeg_path)
+    return bool(path) and name in get_capabilities(path).encoders
+
+
+def has_format(name: str, ffmpeg_path: Optional[str] = None) -> bool:
+    """Indica si FFmpeg incluye el formato indicado (p. ej. 'x11grab', 'pulse')."""
+    path = _resolve(ffmpeg_path)
+    return bool(path) and name in get_capabilities(path).formats
+
+
+def has_filter(name: str, ffmpeg_path: Optional[str] = None) -> bool:
+    """Indica si FFmpeg incluye el filtro indicado (p. ej. 'ddagrab')."""
+    path = _resolve(ffmpeg_path)
+    return bool(path) and name in get_capabilities(path).filters
@@ -8,11 +8,55 @@ Proporciona una interfaz para iniciar y detener procesos de FFmpeg.
 
 import os
 import sys
+import stat
+import shlex
 import signal
+import logging
+import contextlib
+import shutil
 import platform
 import subprocess
-from typing import List, Optional, Union
+import threading
+from collections import deque
+from functools import lru_cache
+from collections.abc import Sequence
+from typing import Callable, Optional
 
+from .ffmpeg_probe import encoder_works, get_capabilities
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger('screen_recorder.ffmpeg')
+
+# Codificadores H.264 por hardware, en orden de preferencia
+HW_H264_ENCODERS = ("h264_nvenc", "h264_vaapi", "h264_qsv", "h264_amf")
+
+# Líneas finales de stderr de FFmpeg que se conservan para diagnóstico
+STDERR_TAIL_LINES = 200
+
+# Tamaño del buffer de los pipes hacia/desde FFmpeg (el pipe por defecto de
+# Windows es de solo 4 KB; en Linux también se amplía el pipe del kernel)
+PIPE_BUFSIZE = 1 << 20
+
+# Segundos que se espera a que FFmpeg termine tras recibir 'q' antes de interrumpirlo
+GRACEFUL_STOP_TIMEOUT = 5
+
+# Primera línea de 'ffmpeg -version' por ruta del binario, para no relanzarlo
+# en cada FFmpegRunner que se construya
+_VERSION_CACHE: dict[str, str] = {}
+
+def _is_executable_file(path: str) -> bool:
+    """Comprueba con un solo stat que la ruta sea un archivo ejecutable."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return stat.S_ISREG(st.st_mode) and bool(st.st_mode & 0o111)
+
+@lru_cache(maxsize=8)
 def find_ffmpeg_path(custom_path: Optional[str] = None) -> Optional[str]:
     """
     Busca el ejecutable de FFmpeg en el sistema.
@@ -22,19 +66,18 @@ def find_ffmpeg_path(custom_path: Optional[str] = None) -> Optional[str]:
         
     Returns:
         Optional[str]: Ruta al ejecutable de FFmpeg o None si no se encuentra.
+    
+    El resultado se memoriza por ruta personalizada; usar
+    find_ffmpeg_path.cache_clear() si FFmpeg se instala con la aplicación abierta.
     """
     # 1. Verificar la ruta personalizada si se proporciona
-    if custom_path and os.path.isfile(custom_path) and os.access(custom_path, os.X_OK):
+    if custom_path and _is_executable_file(custom_path):
         return custom_path
     
-    # 2. Buscar en el PATH
-    ffmpeg_names = ["ffmpeg.exe" if platform.system() == "Windows" else "ffmpeg"]
-    
-    for path_dir in os.environ.get("PATH", "").split(os.pathsep):
-        for name in ffmpeg_names:
-            ffmpeg_path = os.path.join(path_dir, name)
-            if os.path.isfile(ffmpeg_path) and os.access(ffmpeg_path, os.X_OK):
-                return ffmpeg_path
+    # 2. Buscar en el PATH (shutil.which respeta PATHEXT en Windows)
+    ffmpeg_path = shutil.which("ffmpeg")
+    if ffmpeg_path:
+        return ffmpeg_path
     
     # 3. Verificar ubicaciones comunes según la plataforma
     if platform.system() == "Windows":
@@ -58,12 +101,39 @@ def find_ffmpeg_path(custom_path: Optional[str] = None) -> Optional[str]:
         ]
     
     for path in common_paths:
-        if os.path.isfile(path) and os.access(path, os.X_OK):
+        if _is_executable_file(path):
             return path
     
     # 4. No se pudo encontrar FFmpeg
     return None
 
+def select_video_codec(ffmpeg_path: str, preferred: str = "auto") -> str:
+    """
+    Elige el códec de video a usar.
+    
+    Con 'auto' se usa el primer codificador por hardware disponible
+    (NVENC, VAAPI, QSV, AMF) que supere una codificación de prueba, y
+    'libx264' como alternativa.
+    
+    Args:
+        ffmpeg_path (str): Ruta al ejecutable de FFmpeg.
+        preferred (str): Códec configurado por el usuario o 'auto'.
+        
+    Returns:
+        str: Nombre del códec de video a pasar a '-c:v'.
+    """
+    if preferred != "auto":
+        return preferred
+    
+    available = get_capabilities(ffmpeg_path).encoders
+    for encoder in HW_H264_ENCODERS:
+        # VAAPI solo existe en Linux
+        if encoder == "h264_vaapi" and not sys.platform.startswith("linux"):
+            continue
+        if encoder in available and encoder_works(ffmpeg_path, encoder):
+            return encoder
+    return "libx264"
+
 class FFmpegRunner:
     """Gestiona la ejecución de procesos FFmpeg para grabación."""
     
@@ -79,82 +149,145 @@ class FFmpegRunner:
         self.process: Optional[subprocess.Popen] = None
         self.output_file: Optional[str] = None
         self.ready = self.ffmpeg_path is not None
+        self._stderr_tail: deque = deque(maxlen=STDERR_TAIL_LINES)
+        self._stderr_thread: Optional[threading.Thread] = None
         
         if not self.ready:
-            print("Error: No se pudo encontrar FFmpeg.", file=sys.stderr)
+            logger.error("No se pudo encontrar FFmpeg.")
         else:
             self._check_version()
     
     def _check_version(self) -> None:
         """Verifica la versión de FFmpeg y registra información útil."""
         try:
-            result = subprocess.run(
-                [self.ffmpeg_path, "-version"],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            version_info = result.stdout.split('\n')[0]
-            print(f"FFmpeg encontrado: {version_info}")
+            version_info = _VERSION_CACHE.get(self.ffmpeg_path)
+            if version_info is None:
+                result = subprocess.run(
+                    [self.ffmpeg_path, "-version"],
+                    capture_output=True,
+                    text=True,
+                    check=True
+                )
+                version_info = result.stdout.split('\n')[0]
+                _VERSION_CACHE[self.ffmpeg_path] = version_info
+            logger.info("FFmpeg encontrado: %s", version_info)
         except (subprocess.SubprocessError, FileNotFoundError) as e:
-            print(f"Error al verificar la versión de FFmpeg: {e}", file=sys.stderr)
+            logger.error("Error al verificar la versión de FFmpeg: %s", e)
             self.ready = False
     
-    def start_recording(self, output_file: str, ffmpeg_args: List[str]) -> bool:
+    @staticmethod
+    def _grow_pipe(stream) -> None:
+        """Amplía el buffer del kernel del pipe (solo Linux; si falla se ignora)."""
+        if fcntl is None or not hasattr(fcntl, "F_SETPIPE_SZ"):
+            return
+        # Puede fallar si supera /proc/sys/fs/pipe-max-size
+        with contextlib.suppress(OSError):
+            fcntl.fcntl(stream.fileno(), fcntl.F_SETPIPE_SZ, PIPE_BUFSIZE)
+    
+    @staticmethod
+    def _drain_stderr(stream, tail: deque, on_exit: Optional[Callable[[], None]] = None) -> None:
+        """
+        Consume continuamente el stderr de FFmpeg en un hilo aparte.
+        
+        Si nadie lee el pipe, FFmpeg se bloquea al llenarse el buffer del sistema
+        y la grabación se congela. Solo se guardan las últimas líneas en 'tail'.
+        El fin del pipe indica que FFmpeg terminó: entonces se llama a 'on_exit'
+        (desde este hilo).
+        """
+        pending = b''
+        try:
+            # FFmpeg separa las líneas de progreso con '\r'
+            for chunk in iter(lambda: stream.read1(65536), b''):
+                lines = (pending + chunk).replace(b'\r', b'\n').split(b'\n')
+                pending = lines.pop()
+                tail.extend(line for line in lines if line)
+        except (OSError, ValueError):
+            pass  # El pipe se cerró
+        if pending:
+            tail.append(pending)
+        if on_exit is not None:
+            on_exit()
+    
+    def start_recording(self, output_file: str, ffmpeg_args: Sequence[str],
+                        on_exit: Optional[Callable[[], None]] = None) -> bool:
         """
         Inicia un proceso de grabación con FFmpeg.
         
         Args:
             output_file (str): Ruta donde se guardará el archivo de salida.
-            ffmpeg_args (List[str]): Argumentos para FFmpeg (sin incluir el propio 'ffmpeg').
+            ffmpeg_args (Sequence[str]): Argumentos para FFmpeg (sin incluir el propio 'ffmpeg').
+            on_exit (callable, opcional): Se llama desde el hilo lector de stderr
+                                          cuando el proceso termina (por cualquier motivo).
             
         Returns:
             bool: True si el proceso se inició correctamente, False en caso contrario.
         """
         if not self.ready:
-            print("Error: FFmpeg no está listo.", file=sys.stderr)
+            logger.error("FFmpeg no está listo.")
             return False
         
         if self.process is not None:
-            print("Error: Ya hay un proceso de grabación en curso.", file=sys.stderr)
+            logger.error("Ya hay un proceso de grabación en curso.")
             return False
         
         # Asegurar que el directorio de salida exista
         output_dir = os.path.dirname(output_file)
-        if output_dir and not os.path.exists(output_dir):
+        if output_dir:
             try:
-                os.makedirs(output_dir)
+                os.makedirs(output_dir, exist_ok=True)
             except OSError as e:
-                print(f"Error al crear directorio de salida: {e}", file=sys.stderr)
+                logger.error("Error al crear directorio de salida: %s", e)
                 return False
         
         # Construir comando completo
-        cmd = [self.ffmpeg_path] + ffmpeg_args
+        cmd = (self.ffmpeg_path, *ffmpeg_args)
         
         try:
-            # Imprimir comando para depuración (sin mostrar toda la ruta)
-            print("Ejecutando:", ' '.join(['ffmpeg'] + ffmpeg_args))
+            # Comando para depuración (sin mostrar toda la ruta); solo se
+            # construye la cadena si el nivel DEBUG está activo
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Ejecutando: %s", shlex.join(('ffmpeg', *ffmpeg_args)))
             
             # Iniciar proceso
             self.process = subprocess.Popen(
                 cmd,
                 stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
+                # Con salida a archivo FFmpeg no escribe en stdout; un PIPE que
+                # nadie lee solo podría bloquearlo
+                stdout=subprocess.DEVNULL,
                 stderr=subprocess.PIPE,
+                bufsize=PIPE_BUFSIZE,  # Buffer grande: menos llamadas a read() y sin esperas de FFmpeg
                 text=False  # Mantener como binario para evitar problemas de codificación
             )
+            self._grow_pipe(self.process.stderr)
             
             self.output_file = output_file
-            print(f"Proceso FFmpeg iniciado (PID: {self.process.pid})")
-            print(f"Guardando en: {self.output_file}")
+            self._stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+            self._stderr_thread = threading.Thread(
+                target=self._drain_stderr,
+                args=(self.process.stderr, self._stderr_tail, on_exit),
+                name="ffmpeg-stderr",
+                daemon=True
+            )
+            self._stderr_thread.start()
+            logger.info("Proceso FFmpeg iniciado (PID: %s)", self.process.pid)
+            logger.info("Guardando en: %s", self.output_file)
             return True
             
         except Exception as e:
-            print(f"Error al iniciar proceso FFmpeg: {e}", file=sys.stderr)
+            logger.error("Error al iniciar proceso FFmpeg: %s", e)
             self.process = None
             self.output_file = None
             return False
     
+    def is_running(self) -> bool:
+        """
+        Indica, sin bloquear, si el proceso de FFmpeg sigue en ejecución.
+        Permite detectar que FFmpeg terminó por un error (dispositivo ocupado,
+        argumentos inválidos...) sin esperar un tiempo fijo tras lanzarlo.
+        """
+        return self.process is not None and self.process.poll() is None
+    
     def stop_recording(self) -> bool:
         """
         Detiene el proceso de grabación en curso.
@@ -163,26 +296,29 @@ class FFmpegRunner:
             bool: True si el proceso se detuvo correctamente, False en caso contrario.
         """
         if self.process is None:
-            print("No hay proceso de grabación activo.")
+            logger.info("No hay proceso de grabación activo.")
             return False
         
         try:
-            print("Enviando señal de terminación a FFmpeg...")
+            logger.info("Enviando señal de terminación a FFmpeg...")
             
-            # Enviar 'q' a stdin es la forma más segura de terminar FFmpeg
+            # Enviar 'q' a stdin es la forma más segura de terminar FFmpeg:
+            # vacía el codificador y cierra el contenedor (igual que Ctrl+C)
             if self.process.stdin:
                 try:
-                    self.process.stdin.write(b'q')
+                    self.process.stdin.write(b'q\n')
                     self.process.stdin.flush()
+                    self.process.stdin.close()
                 except (BrokenPipeError, IOError):
                     pass  # Ignorar si el pipe ya está cerrado
             
-            # Esperar un tiempo razonable para terminación normal
+            # Esperar un tiempo razonable para terminación normal (vaciar un
+            # codificador por hardware o un fragmento grande puede tardar)
             try:
-                self.process.wait(timeout=3)
-                print("FFmpeg terminado normalmente.")
+                self.process.wait(timeout=GRACEFUL_STOP_TIMEOUT)
+                logger.info("FFmpeg terminado normalmente.")
             except subprocess.TimeoutExpired:
-                print("FFmpeg no respondió a 'q', enviando señal de interrupción...")
+                logger.warning("FFmpeg no respondió a 'q', enviando señal de interrupción...")
                 
                 # En Windows, terminate() y kill() son equivalentes
                 if platform.system() == "Windows":
@@ -193,34 +329,40 @@ class FFmpegRunner:
                 
                 try:
                     self.process.wait(timeout=3)
-                    print("FFmpeg terminado con señal de interrupción.")
+                    logger.info("FFmpeg terminado con señal de interrupción.")
                 except subprocess.TimeoutExpired:
-                    print("FFmpeg no responde, forzando terminación...")
+                    logger.warning("FFmpeg no responde, forzando terminación...")
                     self.process.kill()
                     self.process.wait()
-                    print("FFmpeg terminado forzosamente.")
+                    logger.warning("FFmpeg terminado forzosamente.")
+            
+            # Esperar a que el hilo lector termine de vaciar stderr
+            if self._stderr_thread is not None:
+                self._stderr_thread.join(timeout=2)
+                self._stderr_thread = None
             
-            # Capturar cualquier error en la salida
-            if self.process.stderr:
-                stderr_data = self.process.stderr.read()
-                if stderr_data:
-                    # Mostrar solo las últimas líneas relevantes
-                    try:
-                        stderr_text = stderr_data.decode('utf-8', errors='replace')
-                        last_lines = '\n'.join(stderr_text.split('\n')[-5:])
-                        print(f"Últimas líneas de FFmpeg:\n{last_lines}")
-                    except Exception:
-                        pass
+            # Mostrar solo las últimas líneas relevantes
+            if self._stderr_tail:
+                last_lines = '\n'.join(
+                    line.decode('utf-8', errors='replace')
+                    for line in list(self._stderr_tail)[-5:]
+                )
+                logger.info("Últimas líneas de FFmpeg:\n%s", last_lines)
             
             # Verificar si el archivo de salida se creó correctamente
-            if self.output_file and os.path.exists(self.output_file):
-                file_size = os.path.getsize(self.output_file)
-                print(f"Archivo grabado: {self.output_file} ({file_size / 1024 / 1024:.1f} MB)")
+            # (un solo stat obtiene existencia y tamaño)
+            try:
+                file_size = os.stat(self.output_file).st_size if self.output_file else None
+            except OSError:
+                file_size = None
+            
+            if file_size is not None:
+                logger.info("Archivo grabado: %s (%.1f MB)", self.output_file, file_size / 1024 / 1024)
                 
                 if file_size == 0:
-                    print("Advertencia: El archivo de salida tiene tamaño cero.", file=sys.stderr)
+                    logger.warning("El archivo de salida tiene tamaño cero.")
             else:
-                print("Advertencia: No se encontró el archivo de salida.", file=sys.stderr)
+                logger.warning("No se encontró el archivo de salida.")
             
             # Reiniciar estado
             self.process = None
@@ -230,7 +372,7 @@ class FFmpegRunner:
             return True
             
         except Exception as e:
-            print(f"Error al detener proceso FFmpeg: {e}", file=sys.stderr)
+            logger.error("Error al detener proceso FFmpeg: %s", e)
             # Reiniciar estado incluso con error
             self.process = None
             self.output_file = None
@@ -2,16 +2,189 @@
 
 import sys
 import os
-import time
-from .ffmpeg_runner import FFmpegRunner, find_ffmpeg_path
+import re
+import logging
+import shutil
+import subprocess
+from functools import cached_property
+from concurrent.futures import ThreadPoolExecutor
+from .ffmpeg_runner import FFmpegRunner, find_ffmpeg_path, select_video_codec
+from .ffmpeg_probe import has_filter
 # Importar utilidades de audio
 from . import audio_utils
 
 # Para captura de área seleccionada
-import tempfile
 from PySide6.QtWidgets import QDialog, QApplication
-from PySide6.QtGui import QPainter, QColor, QScreen, QPixmap
-from PySide6.QtCore import Qt, QPoint, QRect, QSize
+from PySide6.QtGui import QPainter, QColor, QScreen, QImage, QStaticText
+from PySide6.QtCore import (Qt, QPoint, QRect, QTimer, QObject, QRunnable,
+                            QThread, QThreadPool, QEventLoop, Signal, Slot)
+
+logger = logging.getLogger('screen_recorder.recorder')
+
+# --- Parámetros de codificación para captura en tiempo real ---
+# 'ultrafast' elimina las fases de análisis más costosas de x264 y 'zerolatency'
+# desactiva lookahead y B-frames: se evitan frames perdidos a cambio de archivos
+# más grandes. Usar 'superfast' o 'veryfast' para reducir tamaño (más CPU).
+PRESET = "ultrafast"
+TUNE = "zerolatency"
+# Valores por defecto si la configuración no los define (los mismos que
+# ConfigManager.DEFAULT_CONFIG); declarados una vez en lugar de en cada llamada
+FRAMERATE = 30
+CRF = "18"  # Menor valor = mejor calidad (18-28 es rango normal)
+PIX_FMT = "yuv420p"  # Necesario para compatibilidad
+AUDIO_CODEC = "aac"
+AUDIO_BITRATE = "192k"
+# Sin detección de cambios de escena: coste por frame estable (el GOP lo fija -g).
+# sliced-threads reparte cada frame en slices codificados en paralelo (threads=0 =
+# todos los núcleos) y sin lookahead no hay dependencia entre frames consecutivos.
+# A igual calidad el bitrate sube ligeramente, pero es lo adecuado en tiempo real.
+X264_PARAMS = (
+    "scenecut=-1:"
+    "sliced-threads=1:threads=0:sync-lookahead=0:rc-lookahead=0"
+)
+# GOP de 2 s (en frames = 2 × framerate), sin B-frames y con un solo frame de
+# referencia: sin reordenación y con el menor buffer de frames del codificador
+GOP_SECONDS = 2
+BFRAMES = 0
+REFS = 1
+# Solo errores en stderr y sin la línea de progreso por frame: menos datos que
+# drenar del pipe y un final de stderr útil para diagnosticar fallos
+QUIET_ARGS = ('-hide_banner', '-loglevel', 'error', '-nostats')
+# Colas de entrada más profundas (paquetes por entrada): absorben picos de
+# captura o pausas del sistema mientras el codificador se pone al día
+THREAD_QUEUE_SIZE = 1024
+# Buffer de tiempo real para gdigrab y los dispositivos DirectShow
+RTBUFSIZE = "256M"
+# Sin buffering en el análisis inicial de la entrada: el primer frame llega antes
+NOBUFFER_INPUT_ARGS = ('-fflags', 'nobuffer')
+# Mínimo buffering en el demuxer de las entradas de audio
+LOW_DELAY_INPUT_ARGS = (*NOBUFFER_INPUT_ARGS, '-flags', 'low_delay')
+# Formato común de las entradas de audio en modo 'merge': con la misma
+# frecuencia y canales, amerge no necesita remuestrear
+AUDIO_INPUT_FORMAT_ARGS = ('-ar', '48000', '-ac', '2')
+# Filtros para combinar micrófono y audio del sistema ('audio_mix_mode'):
+# 'merge' suma los canales estéreo con pan (sin la normalización por muestra
+# de amix); 'amix' sirve para fuentes con formatos distintos
+AUDIO_MIX_FILTERS = {
+    'merge': "[{0}:a][{1}:a]amerge=inputs=2,pan=stereo|c0<c0+c2|c1<c1+c3[aout]",
+    'amix': "[{0}:a][{1}:a]amix=inputs=2:duration=longest[aout]",
+}
+# MP4 fragmentado: el índice (moov) va al principio y cada fragmento es
+# autocontenido, así que la memoria del muxer no crece con la duración y un
+# archivo interrumpido sigue siendo reproducible (mpv, VLC, navegadores)
+FRAGMENTED_MP4_ARGS = ('-movflags', '+frag_keyframe+empty_moov+default_base_moof',
+                       '-frag_duration', '1000000')
+# Contenedores que admiten -movflags (los demás muxers rechazan la opción)
+FRAGMENTED_MP4_EXTENSIONS = frozenset({'.mp4', '.mov'})
+# Resolución usada si no se puede detectar la de la pantalla
+DEFAULT_RESOLUTION = "1920x1080"
+# Salida de 'xrandr': salida primaria, modo activo (marcado con *) y cualquier modo
+_XRANDR_PRIMARY_RE = re.compile(r'connected primary (\d+x\d+)')
+_XRANDR_STAR_RE = re.compile(r'^\s*(\d+x\d+)\s.*\*', re.MULTILINE)
+_XRANDR_ANY_RE = re.compile(r'(\d+x\d+) \+')
+# Codificadores que aceptan directamente las texturas D3D11 de ddagrab
+D3D11_ENCODERS = ('h264_nvenc', 'h264_amf')
+# Nodo DRM usado por el codificador VAAPI
+VAAPI_DEVICE = "/dev/dri/renderD128"
+# Tarjeta DRM usada por kmsgrab (requiere CAP_SYS_ADMIN)
+KMS_DEVICE = "/dev/dri/card0"
+
+
+# --- Mapeo de audio según el número de entradas (0, 1 o 2) ---
+def _map_no_audio(_audio_indices: list[int], _mix_mode: str) -> tuple[str, ...]:
+    logger.debug("Configurando FFmpeg sin audio.")
+    return ('-an',)
+
+
+def _map_single_audio(audio_indices: list[int], _mix_mode: str) -> tuple[str, ...]:
+    # Mapear la única fuente de audio directamente
+    audio_index = audio_indices[0]
+    logger.debug("Configurando FFmpeg con 1 fuente de audio (Índice: %s).", audio_index)
+    return ('-map', f"{audio_index}:a")
+
+
+def _map_mixed_audio(audio_indices: list[int], mix_mode: str) -> tuple[str, ...]:
+    # Combinar las dos fuentes de audio con el filtro del modo elegido
+    idx1, idx2 = audio_indices
+    logger.debug("Configurando FFmpeg con 2 fuentes de audio (Índices: %s, %s), mezclando con %s.", idx1, idx2, mix_mode)
+    filter_complex = AUDIO_MIX_FILTERS[mix_mode].format(idx1, idx2)
+    return ('-filter_complex', filter_complex, '-map', '[aout]')  # Mapear la salida del filtro
+
+
+_AUDIO_MAP_BUILDERS = {0: _map_no_audio, 1: _map_single_audio, 2: _map_mixed_audio}
+
+
+def _output_args(output_filename: str) -> tuple[str, ...]:
+    """Opciones del muxer según el contenedor de salida, seguidas del archivo."""
+    if os.path.splitext(output_filename)[1].lower() in FRAGMENTED_MP4_EXTENSIONS:
+        return (*FRAGMENTED_MP4_ARGS, '-y', output_filename)
+    return ('-y', output_filename)
+
+
+class RecorderSignals(QObject):
+    """Señales del Recorder (Recorder no hereda de QObject)."""
+    # FFmpeg terminó sin que se pidiera detenerlo (error, disco lleno...);
+    # lleva la ruta del archivo que se estaba grabando
+    finished = Signal(object)
+
+
+class _ScreenshotSignals(QObject):
+    """Señal de resultado de los jobs de captura (se crea en el hilo de la GUI)."""
+    done = Signal(object)  # Ruta de la captura o None
+
+
+class _ScreenshotJob(QRunnable):
+    """Ejecuta la captura con FFmpeg (y sus alternativas) en el QThreadPool."""
+
+    def __init__(self, recorder: "Recorder", cmd: list[str], output_filename: str,
+                 selected_rect: QRect | None) -> None:
+        super().__init__()
+        self.recorder = recorder
+        self.cmd = cmd
+        self.output_filename = output_filename
+        self.selected_rect = selected_rect
+        self.signals = _ScreenshotSignals()
+
+    @Slot()
+    def run(self) -> None:
+        result = None
+        try:
+            proc = subprocess.run(self.cmd, capture_output=True, text=True, check=False)
+            result = self.recorder._finish_screenshot(
+                self.output_filename, proc.returncode, proc.stderr, self.selected_rect
+            )
+        except Exception as e:
+            logger.error("Error al capturar pantalla: %s", e)
+        self.signals.done.emit(result)
+
+
+class _ImageSaveJob(QRunnable):
+    """Codifica y guarda en disco una captura de Qt en el QThreadPool.
+
+    QPixmap solo puede usarse en el hilo de la GUI; la captura se convierte
+    antes a QImage, que sí puede codificarse (PNG/JPEG) en otro hilo.
+    """
+
+    def __init__(self, image: QImage, output_filename: str, description: str) -> None:
+        super().__init__()
+        self.image = image
+        self.output_filename = output_filename
+        self.description = description
+        self.signals = _ScreenshotSignals()
+
+    @Slot()
+    def run(self) -> None:
+        result = None
+        try:
+            if self.image.save(self.output_filename, quality=90):
+                logger.info("Captura %sguardada en: %s", self.description, self.output_filename)
+                result = self.output_filename
+            else:
+                logger.error("Error al guardar la captura: %s", self.output_filename)
+        except Exception as e:
+            logger.error("Error al guardar la captura: %s", e)
+        self.signals.done.emit(result)
+
 
 class AreaSelectionDialog(QDialog):
     """Diálogo para seleccionar un área de la pantalla para captura."""
@@ -23,7 +196,8 @@ class AreaSelectionDialog(QDialog):
         self.setCursor(Qt.CrossCursor)
         
         # Cubrir toda la pantalla disponible
-        available_geometry = QApplication.primaryScreen().availableGeometry()
+        screen = QApplication.primaryScreen()
+        available_geometry = screen.availableGeometry()
         self.setGeometry(available_geometry)
         
         # Variables para seguimiento de selección
@@ -36,28 +210,70 @@ class AreaSelectionDialog(QDialog):
         self.instruction_text = "Haz clic y arrastra para seleccionar un área"
         self.cancel_text = "Presiona ESC para cancelar"
         
+        # Textos con el layout de glifos memorizado entre repintados; el de las
+        # dimensiones solo se actualiza cuando cambia el tamaño de la selección
+        self._instruction_static = QStaticText(self.instruction_text)
+        self._cancel_static = QStaticText(self.cancel_text)
+        self._last_dim = (0, 0)
+        self._dim_text = QStaticText()
+        
+        # Repintado agrupado: los movimientos del ratón llegan a la frecuencia del
+        # dispositivo (cientos de Hz); solo se repinta la zona modificada y como
+        # mucho una vez por refresco de la pantalla (16 ms a 60 Hz, 7 ms a 144 Hz)
+        refresh_rate = screen.refreshRate() or 60.0
+        self._dirty_rect = QRect()
+        self._update_timer = QTimer(self)
+        self._update_timer.setSingleShot(True)
+        self._update_timer.setTimerType(Qt.PreciseTimer)
+        self._update_timer.setInterval(max(1, int(1000 / refresh_rate)))
+        self._update_timer.timeout.connect(self._do_update)
+        
+    def _schedule_update(self, rect: QRect) -> None:
+        """Acumula la zona a repintar y programa un único update()."""
+        self._dirty_rect = self._dirty_rect.united(rect)
+        if not self._update_timer.isActive():
+            self._update_timer.start()
+    
+    def _do_update(self) -> None:
+        rect, self._dirty_rect = self._dirty_rect, QRect()
+        self.update(rect)
+    
+    def _set_end_point(self, pos: QPoint) -> None:
+        """Actualiza el extremo de la selección y su rectángulo normalizado."""
+        self.end_point = pos
+        sx, sy = self.start_point.x(), self.start_point.y()
+        ex, ey = pos.x(), pos.y()
+        # Equivale a QRect(start, end).normalized() sin rectángulos temporales
+        self.selection_rect = QRect(min(sx, ex), min(sy, ey),
+                                    abs(ex - sx) + 1, abs(ey - sy) + 1)
+    
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
             self.start_point = event.pos()
-            self.end_point = self.start_point
+            self._set_end_point(self.start_point)
             self.is_selecting = True
             self.update()
     
     def mouseMoveEvent(self, event):
         if self.is_selecting:
-            self.end_point = event.pos()
-            self.update()
+            old_rect = self.selection_rect
+            self._set_end_point(event.pos())
+            # Fuera de la unión de ambas selecciones el overlay no cambia; el
+            # margen cubre el borde y el texto de dimensiones junto a la selección
+            self._schedule_update(old_rect.united(self.selection_rect).adjusted(-130, -40, 130, 40))
     
     def mouseReleaseEvent(self, event):
         if event.button() == Qt.LeftButton and self.is_selecting:
-            self.end_point = event.pos()
+            self._set_end_point(event.pos())
             self.is_selecting = False
-            self.selection_rect = QRect(self.start_point, self.end_point).normalized()
+            self._update_timer.stop()
             # Si la selección es demasiado pequeña, no la aceptamos
             if self.selection_rect.width() > 10 and self.selection_rect.height() > 10:
                 self.accept()
             else:
                 # Reiniciar para una nueva selección
+                self.selection_rect = QRect()
+                self._dirty_rect = QRect()
                 self.update()
     
     def keyPressEvent(self, event):
@@ -68,25 +284,32 @@ class AreaSelectionDialog(QDialog):
         """Dibuja la interfaz de selección de área."""
         painter = QPainter(self)
         
-        # Dibujar un fondo semi-transparente
         bg_color = QColor(0, 0, 0, 128)  # RGBA: negro semi-transparente
-        painter.fillRect(self.rect(), bg_color)
         
         # Dibujar el área seleccionada (transparente)
         if self.is_selecting or not self.selection_rect.isEmpty():
-            select_rect = QRect(self.start_point, self.end_point).normalized()
+            select_rect = self.selection_rect
             
-            # Recortar el área seleccionada del fondo para que sea transparente
-            painter.setCompositionMode(QPainter.CompositionMode_Clear)
-            painter.fillRect(select_rect, Qt.transparent)
+            # Oscurecer solo las cuatro franjas alrededor de la selección: el
+            # hueco queda transparente sin rellenar toda la pantalla y luego
+            # borrarlo con CompositionMode_Clear
+            width, height = self.width(), self.height()
+            top, bottom = select_rect.top(), select_rect.bottom()
+            left, right = select_rect.left(), select_rect.right()
+            painter.fillRect(QRect(0, 0, width, top), bg_color)
+            painter.fillRect(QRect(0, bottom + 1, width, height - bottom - 1), bg_color)
+            painter.fillRect(QRect(0, top, left, select_rect.height()), bg_color)
+            painter.fillRect(QRect(right + 1, top, width - right - 1, select_rect.height()), bg_color)
             
             # Dibujar un borde alrededor de la selección
-            painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
             painter.setPen(QColor(255, 255, 255, 200))  # Blanco semi-transparente
             painter.drawRect(select_rect)
             
             # Mostrar las dimensiones
-            dimension_text = f"{select_rect.width()} × {select_rect.height()}"
+            dim = (select_rect.width(), select_rect.height())
+            if dim != self._last_dim:
+                self._dim_text.setText(f"{dim[0]} × {dim[1]}")
+                self._last_dim = dim
             text_x = select_rect.right() - 120
             text_y = select_rect.bottom() + 30
             
@@ -94,12 +317,18 @@ class AreaSelectionDialog(QDialog):
                 text_y = select_rect.top() - 20
             
             painter.setPen(QColor(255, 255, 255, 255))
-            painter.drawText(text_x, text_y, dimension_text)
+            # QStaticText se posiciona por la esquina superior, no por la línea base
+            ascent = painter.fontMetrics().ascent()
+            painter.drawStaticText(text_x, text_y - ascent, self._dim_text)
+        else:
+            # Sin selección: fondo semi-transparente en toda la pantalla
+            painter.fillRect(self.rect(), bg_color)
+            ascent = painter.fontMetrics().ascent()
         
         # Dibujar instrucciones
         painter.setPen(QColor(255, 255, 255, 200))
-        painter.drawText(10, 30, self.instruction_text)
-        painter.drawText(10, 60, self.cancel_text)
+        painter.drawStaticText(10, 30 - ascent, self._instruction_static)
+        painter.drawStaticText(10, 60 - ascent, self._cancel_static)
     
     def get_selection(self):
         """Retorna el rectángulo de selección."""
@@ -122,33 +351,222 @@ class Recorder:
         self.ffmpeg_runner: FFmpegRunner | None = None
         self.ffmpeg_ready: bool = False
         self.last_output_path: str | None = None
+        self._stop_requested = False
+        self.signals = RecorderSignals()
+        app = QApplication.instance()
+        if app is not None and QThread.currentThread() != app.thread():
+            # Creado en un hilo de trabajo: las señales deben vivir en el de la GUI
+            self.signals.moveToThread(app.thread())
 
         # --- Configuración de Audio ---
-        self.record_mic: bool = config.get('record_audio_mic', True)
-        self.record_loopback: bool = config.get('record_audio_loopback', True)
-        # Obtener nombres de config o intentar detectar los por defecto
-        self.mic_dev_name: str | None = self._get_configured_or_default_device(
-            config.get('audio_mic_device_name'), 'input'
-        )
-        self.loopback_dev_name: str | None = self._get_configured_or_default_device(
-            config.get('audio_loopback_device_name'), 'loopback'
-        )
-        print(f"Configuración Audio - Micrófono: {'Activado' if self.record_mic else 'Desactivado'}, Dispositivo: {self.mic_dev_name or 'No encontrado/Default'}")
-        print(f"Configuración Audio - Sistema: {'Activado' if self.record_loopback else 'Desactivado'}, Dispositivo: {self.loopback_dev_name or 'No encontrado/Default'}")
+        # (propiedades: al cambiarlas se descarta el comando FFmpeg precalculado)
+        self.record_mic = config.get('record_audio_mic', True)
+        self.record_loopback = config.get('record_audio_loopback', True)
+
+        # Obtener nombres de config o intentar detectar los por defecto. La
+        # enumeración de PortAudio y el arranque de FFmpeg (búsqueda, versión,
+        # capacidades, prueba del codificador) son independientes: se solapan.
+        # Ambos dispositivos se resuelven en el mismo hilo porque comparten la
+        # enumeración en caché y PortAudio no admite consultas concurrentes.
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="audio-devices") as pool:
+            devices_future = pool.submit(self._resolve_audio_devices)
+
+            logger.info("Inicializando FFmpeg...")
+            self._initialize_ffmpeg()
+
+            self.mic_dev_name, self.loopback_dev_name = devices_future.result()
+        logger.info("Configuración Audio - Micrófono: %s, Dispositivo: %s", 'Activado' if self.record_mic else 'Desactivado', self.mic_dev_name or 'No encontrado/Default')
+        logger.info("Configuración Audio - Sistema: %s, Dispositivo: %s", 'Activado' if self.record_loopback else 'Desactivado', self.loopback_dev_name or 'No encontrado/Default')
         # Nota: Guardar la configuración actualizada con los defaults detectados
         # podría ser útil, pero lo haremos solo cuando el usuario cambie algo explícitamente.
 
-        print("Recorder: Inicializando FFmpeg...")
-        self._initialize_ffmpeg()
+        self._audio_codec_args: tuple[str, ...] = (
+            '-c:a', config.get('audio_codec', AUDIO_CODEC),
+            '-b:a', config.get('audio_bitrate', AUDIO_BITRATE)
+        )
+
+        # Profundidad de las colas de entrada (configurables para equipos con picos de carga)
+        self._input_queue_args: tuple[str, ...] = (
+            '-thread_queue_size', str(config.get('thread_queue_size', THREAD_QUEUE_SIZE))
+        )
+        self._rtbuf_args: tuple[str, ...] = ('-rtbufsize', str(config.get('rtbufsize', RTBUFSIZE)))
+
+        # Modo de mezcla de micrófono + sistema; en 'merge' ambas entradas se
+        # piden en el mismo formato para que FFmpeg no tenga que remuestrear
+        self._audio_mix_mode: str = config.get('audio_mix_mode', 'merge')
+        if self._audio_mix_mode not in AUDIO_MIX_FILTERS:
+            logger.warning("audio_mix_mode '%s' no válido, usando 'amix'.", self._audio_mix_mode)
+            self._audio_mix_mode = 'amix'
+        self._audio_input_args: tuple[str, ...] = (
+            AUDIO_INPUT_FORMAT_ARGS if self._audio_mix_mode == 'merge' else ()
+        )
+
+        # Entorno gráfico: no cambia durante la vida del proceso
+        self._display: str = os.environ.get('DISPLAY', ':0.0')
+        self._session_type: str = os.environ.get('XDG_SESSION_TYPE', '').lower()
+
+        # Herramientas alternativas de captura en Linux, buscadas una sola vez en el PATH
+        self._screenshot_tools: dict[str, str | None] = {
+            name: shutil.which(name) for name in ("gnome-screenshot", "scrot", "import")
+        }
+
+        # Resolución de pantalla detectada (se invalida cuando cambian las pantallas)
+        self._cached_resolution: str | None = None
+        self._pipewire_fallback_logged = False
+        self._screen_signals_connected = False
+        self.connect_screen_signals()
+
+        # Comando FFmpeg sin el archivo de salida: lo precalcula RecorderInitWorker
+        # fuera del hilo de la GUI (elegir el códec puede lanzar codificaciones de
+        # prueba) y después cada grabación solo añade la ruta (ver _get_platform_cmd_args)
+        self._cmd_prefix: tuple[str, ...] | None = None
+        self._cmd_prefix_key: tuple | None = None
+
+    @cached_property
+    def video_codec(self) -> str:
+        """Códec de video a usar; se decide la primera vez que se necesita."""
+        if not self.ffmpeg_ready:
+            return "libx264"
+        codec = select_video_codec(self.ffmpeg_path, self.config.get('video_codec', "auto"))
+        logger.info("Códec de video seleccionado: %s", codec)
+        return codec
+
+    @cached_property
+    def _codec_args(self) -> tuple[str, ...]:
+        """Argumentos de codificación: dependen solo de la config y del códec elegido."""
+        config = self.config
+        return self._get_video_codec_args(
+            self.video_codec,
+            config.get('preset', PRESET),
+            config.get('tune', TUNE),
+            config.get('crf', CRF),
+            config.get('pixfmt', PIX_FMT),
+            gop=config.get('gop', GOP_SECONDS * int(config.get('framerate', FRAMERATE))),
+            bframes=config.get('bframes', BFRAMES),
+            refs=config.get('refs', REFS),
+        )
+
+    # --- Propiedades de audio: invalidan el comando precalculado ---
+    @property
+    def record_mic(self) -> bool:
+        return self._record_mic
+
+    @record_mic.setter
+    def record_mic(self, value: bool) -> None:
+        self._record_mic = value
+        self.invalidate_cmd_cache()
+
+    @property
+    def record_loopback(self) -> bool:
+        return self._record_loopback
+
+    @record_loopback.setter
+    def record_loopback(self, value: bool) -> None:
+        self._record_loopback = value
+        self.invalidate_cmd_cache()
+
+    @property
+    def mic_dev_name(self) -> str | None:
+        return self._mic_dev_name
+
+    @mic_dev_name.setter
+    def mic_dev_name(self, value: str | None) -> None:
+        self._mic_dev_name = value
+        self.invalidate_cmd_cache()
+
+    @property
+    def loopback_dev_name(self) -> str | None:
+        return self._loopback_dev_name
+
+    @loopback_dev_name.setter
+    def loopback_dev_name(self, value: str | None) -> None:
+        self._loopback_dev_name = value
+        self.invalidate_cmd_cache()
+
+    def connect_screen_signals(self) -> None:
+        """Invalida la resolución en caché cuando Qt notifica cambios de pantalla.
+
+        Solo tiene efecto en el hilo de la GUI: si el Recorder se crea en un
+        hilo de trabajo, quien lo recibe debe llamar a este método después.
+        """
+        app = QApplication.instance()
+        if (app is None or self._screen_signals_connected
+                or QThread.currentThread() != app.thread()):
+            return
+        self._screen_signals_connected = True
+        app.screenAdded.connect(self._on_screen_added)
+        app.screenRemoved.connect(self.invalidate_resolution_cache)
+        app.primaryScreenChanged.connect(self.invalidate_resolution_cache)
+        for screen in app.screens():
+            screen.geometryChanged.connect(self.invalidate_resolution_cache)
+
+    def _on_screen_added(self, screen: QScreen) -> None:
+        screen.geometryChanged.connect(self.invalidate_resolution_cache)
+        self.invalidate_resolution_cache()
+
+    def invalidate_resolution_cache(self, *_args) -> None:
+        """Descarta la resolución detectada; se volverá a calcular en el siguiente uso."""
+        self._cached_resolution = None
+        self.invalidate_cmd_cache()
+
+    def _detect_x11_resolution(self) -> str:
+        """Devuelve la resolución 'ANCHOxALTO' de la pantalla principal (memorizada).
+
+        Se consulta primero a Qt (sin procesos externos) y solo si no hay
+        QApplication se recurre a xrandr.
+        """
+        if self._cached_resolution:
+            return self._cached_resolution
+
+        resolution = None
+        screen = QApplication.primaryScreen() if QApplication.instance() else None
+        if screen is not None:
+            # x11grab trabaja en píxeles físicos
+            geometry = screen.geometry()
+            ratio = screen.devicePixelRatio()
+            resolution = f"{round(geometry.width() * ratio)}x{round(geometry.height() * ratio)}"
+        else:
+            try:
+                xrandr_output = subprocess.check_output(['xrandr', '--current']).decode('utf-8')
+                # Preferir la salida primaria, luego el modo activo (*) y por último cualquiera
+                match = (_XRANDR_PRIMARY_RE.search(xrandr_output)
+                         or _XRANDR_STAR_RE.search(xrandr_output)
+                         or _XRANDR_ANY_RE.search(xrandr_output))
+                if match:
+                    resolution = match.group(1)
+            except (subprocess.SubprocessError, FileNotFoundError):
+                pass
+
+        if not resolution:
+            logger.warning("No se pudo determinar resolución de pantalla, usando %s", DEFAULT_RESOLUTION)
+            return DEFAULT_RESOLUTION
+
+        logger.info("Resolución detectada para captura: %s", resolution)
+        self._cached_resolution = resolution
+        return resolution
+
+    def refresh_audio_devices(self) -> None:
+        """Vuelve a resolver los dispositivos de audio tras una nueva enumeración."""
+        self.mic_dev_name, self.loopback_dev_name = self._resolve_audio_devices()
+
+    def _resolve_audio_devices(self) -> tuple[str | None, str | None]:
+        """Devuelve los nombres (micrófono, loopback) de la config o los detectados."""
+        mic = self._get_configured_or_default_device(
+            self.config.get('audio_mic_device_name'), 'input'
+        )
+        loopback = self._get_configured_or_default_device(
+            self.config.get('audio_loopback_device_name'), 'loopback'
+        )
+        return mic, loopback
 
     def _get_configured_or_default_device(self, config_name: str | None, kind: str) -> str | None:
         """Obtiene el nombre del dispositivo de la config o busca el default."""
         if config_name:
             # TODO: Podríamos añadir una verificación aquí si el dispositivo aún existe
-            print(f"Usando dispositivo '{kind}' desde config: {config_name}")
+            logger.debug("Usando dispositivo '%s' desde config: %s", kind, config_name)
             return config_name
 
-        print(f"Nombre para '{kind}' no en config, buscando default...")
+        logger.debug("Nombre para '%s' no en config, buscando default...", kind)
         device_info: dict | None = None
         if kind == 'input':
             device_info = audio_utils.get_default_device_info('input')
@@ -157,10 +575,10 @@ class Recorder:
         # Podríamos añadir 'output' si fuera necesario en el futuro
 
         if device_info:
-            print(f"Dispositivo default '{kind}' encontrado: {device_info.get('name')}")
+            logger.debug("Dispositivo default '%s' encontrado: %s", kind, device_info.get('name'))
             return device_info.get('name') # Devolver solo el nombre
         else:
-             print(f"No se encontró dispositivo default para '{kind}'.")
+             logger.info("No se encontró dispositivo default para '%s'.", kind)
              return None
 
     def _initialize_ffmpeg(self) -> None:
@@ -170,247 +588,390 @@ class Recorder:
             self.ffmpeg_runner = FFmpegRunner(self.ffmpeg_path)
             self.ffmpeg_ready = self.ffmpeg_runner.ready
             if self.ffmpeg_ready:
-                print(f"Recorder: FFmpeg listo en '{self.ffmpeg_path}'.")
+                logger.info("FFmpeg listo en '%s'.", self.ffmpeg_path)
             else:
-                print("Recorder Error: FFmpegRunner no pudo inicializarse.", file=sys.stderr)
+                logger.error("FFmpegRunner no pudo inicializarse.")
         else:
             self.ffmpeg_ready = False
-            print("Recorder Error: FFmpeg no encontrado.", file=sys.stderr)
+            logger.error("FFmpeg no encontrado.")
 
-    def _get_platform_cmd_args(self, output_filename: str) -> list[str] | None:
-        """Genera los argumentos FFmpeg para Video + Audio dependiendo de la plataforma."""
+    def _cmd_cache_key(self) -> tuple:
+        """Valores de la config de los que depende el comando de grabación.
+
+        Incluye todo lo que leen video_codec y _codec_args. Los ajustes de
+        audio del Recorder no forman parte de la clave: sus setters ya
+        descartan el comando precalculado.
+        """
+        config = self.config
+        return (
+            config.get('framerate', FRAMERATE), config.get('video_size', ''),
+            config.get('linux_capture', 'auto'), config.get('windows_capture', 'auto'),
+            config.get('video_codec', "auto"), config.get('crf', CRF),
+            config.get('preset', PRESET), config.get('tune', TUNE),
+            config.get('pixfmt', PIX_FMT), config.get('gop'),
+            config.get('bframes', BFRAMES), config.get('refs', REFS),
+        )
+
+    def invalidate_cmd_cache(self) -> None:
+        """Descarta el comando FFmpeg precalculado; se reconstruirá en la próxima grabación."""
+        self._cmd_prefix = None
+        self._cmd_prefix_key = None
+        # El códec elegido y sus argumentos dependen de la misma config que el prefijo
+        self.__dict__.pop('video_codec', None)
+        self.__dict__.pop('_codec_args', None)
+
+    def _build_static_cmd_prefix(self) -> tuple[str, ...] | None:
+        """Construye el comando FFmpeg completo salvo el archivo de salida."""
         if sys.platform == "win32":
-            return self._get_windows_cmd_args(output_filename)
+            cmd = self._get_windows_cmd_args("")
         elif sys.platform.startswith("linux"):
-            return self._get_linux_cmd_args(output_filename)
+            cmd = self._get_linux_cmd_args("")
         else:
-            print(f"Plataforma no soportada para grabación: {sys.platform}", file=sys.stderr)
+            logger.error("Plataforma no soportada para grabación: %s", sys.platform)
             return None
 
-    def _get_linux_cmd_args(self, output_filename: str) -> list[str]:
-        """Genera los argumentos FFmpeg para Video + Audio en Linux (x11grab + pulse/alsa)."""
-        print("Generando argumentos FFmpeg para Linux (x11grab + pulse)...")
+        # Sin extensión no hay opciones de muxer: el prefijo termina antes de '-y'
+        self._cmd_prefix = cmd[:-2]
+        self._cmd_prefix_key = self._cmd_cache_key()
+        return self._cmd_prefix
+
+    def _get_platform_cmd_args(self, output_filename: str) -> tuple[str, ...] | None:
+        """Genera los argumentos FFmpeg para Video + Audio dependiendo de la plataforma.
+
+        El prefijo del comando se calcula al crear el Recorder (o tras un cambio
+        de configuración); en cada grabación solo se añaden las opciones del
+        contenedor y la ruta de salida.
+        """
+        prefix = self._cmd_prefix
+        if prefix is None or self._cmd_prefix_key != self._cmd_cache_key():
+            self.invalidate_cmd_cache()
+            prefix = self._build_static_cmd_prefix()
+            if prefix is None:
+                return None
+        return prefix + _output_args(output_filename)
+
+    @staticmethod
+    def _get_video_codec_args(video_codec: str, preset: str, tune: str,
+                              crf: str, pix_fmt: str, gop: int = 60,
+                              bframes: int = BFRAMES, refs: int = REFS) -> tuple[str, ...]:
+        """Genera los argumentos de codificación de video según el códec elegido."""
+        if video_codec == 'h264_nvenc':
+            # NVENC: preset p1..p7 y ajuste de baja latencia; -cq equivale a CRF
+            return ('-c:v', video_codec, '-preset', 'p4', '-tune', 'll',
+                    '-rc', 'vbr', '-cq', str(crf))
+        if video_codec == 'h264_vaapi':
+            # Los frames se suben a la GPU en formato NV12 antes de codificar
+            return ('-vf', 'format=nv12,hwupload', '-c:v', video_codec, '-qp', str(crf))
+        if video_codec == 'h264_qsv':
+            return ('-c:v', video_codec, '-preset', 'veryfast',
+                    '-global_quality', str(crf), '-pix_fmt', 'nv12')
+        if video_codec == 'h264_amf':
+            return ('-c:v', video_codec, '-usage', 'lowlatency', '-rc', 'cqp',
+                    '-qp_i', str(crf), '-qp_p', str(crf))
+
+        args = ['-c:v', video_codec, '-preset', preset]
+        if video_codec == 'libx264' and tune:
+            args.extend(['-tune', tune, '-x264-params', X264_PARAMS])
+        args.extend(['-crf', crf, '-pix_fmt', pix_fmt])
+        if video_codec == 'libx264':
+            args.extend(['-g', str(gop), '-keyint_min', str(gop),
+                         '-bf', str(bframes), '-refs', str(refs)])
+        return tuple(args)
+
+    def _get_linux_capture_backend(self) -> str:
+        """Determina el backend de captura de video en Linux.
+
+        'linux_capture' en la config admite 'x11grab', 'kmsgrab', 'pipewire'
+        o 'auto' (PipeWire en sesiones Wayland, x11grab en el resto).
+        kmsgrab requiere privilegios sobre DRM, por eso solo se usa si se pide.
+        El filtro pipewiregrab no está en las compilaciones habituales de
+        FFmpeg: sin él, 'auto' usa x11grab (a través de XWayland en Wayland).
+        """
+        capture = self.config.get('linux_capture', 'auto')
+        if capture == 'auto':
+            capture = 'x11grab'
+            if self._session_type == 'wayland':
+                if has_filter('pipewiregrab', self.ffmpeg_path):
+                    capture = 'pipewire'
+                elif not self._pipewire_fallback_logged:
+                    self._pipewire_fallback_logged = True
+                    logger.warning("Sesión Wayland pero FFmpeg no incluye el filtro "
+                                   "pipewiregrab; se captura con x11grab (XWayland).")
+        return capture
+
+    def _get_windows_capture_backend(self) -> str:
+        """Determina el backend de captura de video en Windows.
+
+        'windows_capture' en la config admite 'gdigrab', 'ddagrab' o 'auto'.
+        ddagrab (Desktop Duplication, Windows 8+) entrega texturas D3D11 que
+        NVENC y AMF codifican sin pasar por memoria del sistema; con 'auto'
+        solo se usa en ese caso. Con otros códecs los frames hay que
+        descargarlos de la GPU y gdigrab sale igual de caro.
+        """
+        capture = self.config.get('windows_capture', 'auto')
+        if capture == 'auto':
+            capture = 'gdigrab'
+            if (self.video_codec in D3D11_ENCODERS
+                    and sys.getwindowsversion()[:2] >= (6, 2)
+                    and has_filter('ddagrab', self.ffmpeg_path)):
+                capture = 'ddagrab'
+        return capture
+
+    def _build_audio_and_output(self, cmd: list[str], audio_indices: list[int],
+                                output_filename: str,
+                                video_codec_args: tuple[str, ...]) -> tuple[str, ...]:
+        """Añade códecs, mapeo y salida (común a Windows y Linux) y devuelve el comando final."""
+        # 3. Códecs y Mapeo
+        cmd += video_codec_args
+        cmd += ('-map', '0:v')  # Mapear siempre el video (entrada 0)
+        cmd += _AUDIO_MAP_BUILDERS[len(audio_indices)](audio_indices, self._audio_mix_mode)
+        if audio_indices:
+            cmd += self._audio_codec_args
+
+        # 4. Archivo de Salida y Opciones Finales
+        cmd += _output_args(output_filename)
+
+        # Tupla inmutable: se pasa tal cual a Popen sin copias intermedias
+        return tuple(cmd)
+
+    def _get_linux_cmd_args(self, output_filename: str) -> tuple[str, ...]:
+        """Genera los argumentos FFmpeg para Video + Audio en Linux (x11grab/kmsgrab/pipewire + pulse)."""
+        logger.debug("Generando argumentos FFmpeg para Linux...")
 
         # --- Configuración de calidad de video ---
-        framerate = self.config.get('framerate', 30)
-        preset = self.config.get('preset', "medium")  # Mejor calidad que "veryfast"
-        crf = self.config.get('crf', "18")  # Menor valor = mejor calidad (18-28 es rango normal)
-        video_codec = self.config.get('video_codec', "libx264")
-        audio_codec = self.config.get('audio_codec', "aac")
-        audio_bitrate = self.config.get('audio_bitrate', "192k")  # Aumentado de 128k a 192k
-        pix_fmt = "yuv420p"  # Necesario para compatibilidad
+        framerate = str(self.config.get('framerate', FRAMERATE))
+        crf = self.config.get('crf', CRF)  # Usado por el codificador VAAPI de kmsgrab
+        video_codec = self.video_codec
 
         # --- Construcción del Comando ---
-        cmd = [self.ffmpeg_path]
-
-        # 1. Configuración de entrada de video con x11grab
-        display = os.environ.get('DISPLAY', ':0.0')
-        video_size = self.config.get('video_size', '')
-        if not video_size:
-            # Usar dimensiones completas de la pantalla si no se especifica
-            import subprocess
-            try:
-                # Obtener resolución de pantalla
-                xrandr_output = subprocess.check_output(['xrandr', '--current']).decode('utf-8')
-                for line in xrandr_output.split('\n'):
-                    if '*' in line:  # La línea con * tiene la resolución actual
-                        parts = line.split()
-                        for part in parts:
-                            if 'x' in part and part[0].isdigit():
-                                video_size = part
-                                break
-                        break
-            except (subprocess.SubprocessError, FileNotFoundError):
-                print("No se pudo determinar resolución de pantalla, usando 1920x1080")
-                video_size = "1920x1080"
+        # Cada sección se añade con una tupla: sin listas temporales
+        cmd = [self.ffmpeg_path, *QUIET_ARGS]
+        capture = self._get_linux_capture_backend()
+        if video_codec == 'h264_vaapi' and capture != 'kmsgrab':
+            # El dispositivo VAAPI debe declararse antes de las entradas
+            cmd += ('-vaapi_device', VAAPI_DEVICE)
 
-        # Añadir entrada de video
-        cmd.extend([
-            '-f', 'x11grab',
-            '-framerate', str(framerate),
-            '-video_size', video_size,
-            '-i', display
-        ])
-        video_input_index = 0
+        # 1. Entrada de video según el backend de captura
+        if capture == 'kmsgrab':
+            # DRM/KMS: los frames (DMA-BUF) no salen de la GPU hasta el codificador
+            cmd += ('-device', KMS_DEVICE)
+            cmd += self._input_queue_args
+            cmd += ('-f', 'kmsgrab', '-framerate', framerate, '-i', '-')
+        elif capture == 'pipewire':
+            # Wayland: captura a través del portal de escritorio y PipeWire
+            cmd += self._input_queue_args
+            cmd += ('-f', 'lavfi', '-i', f'pipewiregrab=framerate={framerate}')
+        else:
+            video_size = self.config.get('video_size', '')
+            if not video_size:
+                # Usar dimensiones completas de la pantalla si no se especifica
+                video_size = self._detect_x11_resolution()
+
+            # Añadir entrada de video
+            cmd += self._input_queue_args
+            cmd += NOBUFFER_INPUT_ARGS
+            cmd += ('-f', 'x11grab', '-framerate', framerate,
+                    '-video_size', video_size, '-i', self._display)
 
-        # 2. Entradas de Audio (PulseAudio)
-        audio_inputs = []
-        next_audio_index = 1
+        # 2. Entradas de Audio (PulseAudio); la entrada 0 es el video
+        audio_indices: list[int] = []
 
         # Micrófono
         if self.record_mic:
-            cmd.extend([
-                '-f', 'pulse',
-                '-i', 'default'  # Usa el micrófono predeterminado
-            ])
-            audio_inputs.append({'index': next_audio_index, 'type': 'mic'})
-            next_audio_index += 1
-            print("Añadiendo entrada de Micrófono: default (PulseAudio)")
+            cmd += self._input_queue_args
+            cmd += LOW_DELAY_INPUT_ARGS
+            cmd += self._audio_input_args
+            cmd += ('-f', 'pulse', '-i', 'default')  # Usa el micrófono predeterminado
+            audio_indices.append(len(audio_indices) + 1)
+            logger.debug("Añadiendo entrada de Micrófono: default (PulseAudio)")
 
         # Audio del sistema (monitor)
         if self.record_loopback:
             # En PulseAudio, el monitor suele ser "nombre_del_dispositivo.monitor"
             monitor_device = "0.monitor"  # Usa el monitor de salida predeterminada
-            cmd.extend([
-                '-f', 'pulse',
-                '-i', monitor_device
-            ])
-            audio_inputs.append({'index': next_audio_index, 'type': 'loopback'})
-            next_audio_index += 1
-            print(f"Añadiendo entrada de Loopback: {monitor_device} (PulseAudio)")
+            cmd += self._input_queue_args
+            cmd += LOW_DELAY_INPUT_ARGS
+            cmd += self._audio_input_args
+            cmd += ('-f', 'pulse', '-i', monitor_device)
+            audio_indices.append(len(audio_indices) + 1)
+            logger.debug("Añadiendo entrada de Loopback: %s (PulseAudio)", monitor_device)
 
-        # 3. Códecs y Mapeo
-        cmd.extend(['-c:v', video_codec, '-preset', preset, '-crf', crf, '-pix_fmt', pix_fmt])
-        cmd.extend(['-map', f"{video_input_index}:v"])  # Mapear siempre el video
-
-        if len(audio_inputs) == 0:
-            cmd.extend(['-an'])  # Sin audio
-            print("Configurando FFmpeg sin audio.")
-        elif len(audio_inputs) == 1:
-            # Mapear la única fuente de audio directamente
-            audio_index = audio_inputs[0]['index']
-            cmd.extend(['-map', f"{audio_index}:a"])
-            cmd.extend(['-c:a', audio_codec, '-b:a', audio_bitrate])
-            print(f"Configurando FFmpeg con 1 fuente de audio (Índice: {audio_index}).")
-        elif len(audio_inputs) == 2:
-            # Mezclar las dos fuentes de audio usando amix
-            idx1 = audio_inputs[0]['index']
-            idx2 = audio_inputs[1]['index']
-            filter_complex = f"[{idx1}:a][{idx2}:a]amix=inputs=2:duration=longest[aout]"
-            cmd.extend(['-filter_complex', filter_complex])
-            cmd.extend(['-map', '[aout]'])  # Mapear la salida del filtro
-            cmd.extend(['-c:a', audio_codec, '-b:a', audio_bitrate])
-            print(f"Configurando FFmpeg con 2 fuentes de audio mezclados con amix.")
-
-        # 4. Archivo de Salida y Opciones Finales
-        cmd.extend(['-y', output_filename])
-
-        return cmd
+        if capture == 'kmsgrab':
+            # Mapear los frames DRM a VAAPI y convertir a NV12 sin copiar a memoria
+            video_codec_args = ('-vf', 'hwmap=derive_device=vaapi,scale_vaapi=format=nv12',
+                                '-c:v', 'h264_vaapi', '-qp', str(crf))
+        else:
+            video_codec_args = self._codec_args
+        return self._build_audio_and_output(cmd, audio_indices, output_filename, video_codec_args)
 
-    def _get_windows_cmd_args(self, output_filename: str) -> list[str]:
-        """Genera los argumentos FFmpeg para Video + Audio en Windows (dshow)."""
-        print("Generando argumentos FFmpeg para Windows (gdigrab + dshow)...")
+    def _get_windows_cmd_args(self, output_filename: str) -> tuple[str, ...]:
+        """Genera los argumentos FFmpeg para Video + Audio en Windows (gdigrab/ddagrab + dshow)."""
+        capture = self._get_windows_capture_backend()
+        logger.debug("Generando argumentos FFmpeg para Windows (%s + dshow)...", capture)
 
         # --- Configuración de calidad de video ---
-        framerate = self.config.get('framerate', 30)
-        preset = self.config.get('preset', "medium")  # Mejor calidad que "veryfast"
-        crf = self.config.get('crf', "18")  # Menor valor = mejor calidad (18-28 es rango normal)
-        video_codec = self.config.get('video_codec', "libx264")
-        audio_codec = self.config.get('audio_codec', "aac")
-        audio_bitrate = self.config.get('audio_bitrate', "192k")  # Aumentado de 128k a 192k
-        pix_fmt = "yuv420p"  # Necesario para compatibilidad
+        framerate = str(self.config.get('framerate', FRAMERATE))
 
         # --- Construcción del Comando ---
-        cmd = [self.ffmpeg_path]
+        # Cada sección se añade con una tupla: sin listas temporales
+        cmd = [self.ffmpeg_path, *QUIET_ARGS]
 
-        # 1. Entrada de Video (gdigrab) - Siempre presente
-        cmd.extend(['-f', 'gdigrab', '-framerate', str(framerate), '-i', 'desktop'])
-        video_input_index = 0  # gdigrab es la entrada 0
+        # 1. Entrada de Video - Siempre presente
+        video_codec_args = self._codec_args
+        cmd += self._input_queue_args
+        if capture == 'ddagrab':
+            # Desktop Duplication: los frames se quedan en la GPU como texturas D3D11
+            cmd += ('-f', 'lavfi', '-i', f'ddagrab=framerate={framerate}')
+            if self.video_codec not in D3D11_ENCODERS:
+                # Códecs que no aceptan texturas D3D11: descargar los frames
+                video_codec_args = ('-vf', 'hwdownload,format=bgra', *video_codec_args)
+        else:
+            cmd += self._rtbuf_args
+            cmd += NOBUFFER_INPUT_ARGS
+            cmd += ('-f', 'gdigrab', '-framerate', framerate, '-i', 'desktop')
 
-        # 2. Entradas de Audio (dshow) - Opcionales
-        audio_inputs = []
-        next_audio_index = 1  # El siguiente índice de entrada después del video
+        # 2. Entradas de Audio (dshow) - Opcionales; la entrada 0 es el video
+        audio_indices: list[int] = []
 
         # Micrófono
         if self.record_mic and self.mic_dev_name:
             # ¡Importante! Los nombres dshow deben ser exactos. Ejecutar
             # 'ffmpeg -list_devices true -f dshow -i dummy' para verificarlos.
             mic_input_str = f"audio={self.mic_dev_name}"
-            cmd.extend(['-f', 'dshow', '-i', mic_input_str])
-            audio_inputs.append({'index': next_audio_index, 'type': 'mic'})
-            next_audio_index += 1
-            print(f"Añadiendo entrada de Micrófono: {mic_input_str} (Índice: {audio_inputs[-1]['index']})")
+            cmd += self._input_queue_args
+            cmd += self._rtbuf_args
+            cmd += self._audio_input_args
+            cmd += ('-f', 'dshow', '-i', mic_input_str)
+            audio_indices.append(len(audio_indices) + 1)
+            logger.debug("Añadiendo entrada de Micrófono: %s (Índice: %s)", mic_input_str, audio_indices[-1])
         elif self.record_mic:
-            print("Advertencia: Grabar Micrófono está activado pero no se encontró/configuró dispositivo.")
+            logger.warning("Grabar Micrófono está activado pero no se encontró/configuró dispositivo.")
 
         # Loopback (Audio del sistema)
         if self.record_loopback and self.loopback_dev_name:
             loopback_input_str = f"audio={self.loopback_dev_name}"
-            cmd.extend(['-f', 'dshow', '-i', loopback_input_str])
-            audio_inputs.append({'index': next_audio_index, 'type': 'loopback'})
-            next_audio_index += 1
-            print(f"Añadiendo entrada de Loopback: {loopback_input_str} (Índice: {audio_inputs[-1]['index']})")
+            cmd += self._input_queue_args
+            cmd += self._rtbuf_args
+            cmd += self._audio_input_args
+            cmd += ('-f', 'dshow', '-i', loopback_input_str)
+            audio_indices.append(len(audio_indices) + 1)
+            logger.debug("Añadiendo entrada de Loopback: %s (Índice: %s)", loopback_input_str, audio_indices[-1])
         elif self.record_loopback:
-            print("Advertencia: Grabar Loopback está activado pero no se encontró/configuró dispositivo.")
-            print("             Asegúrate de que 'Stereo Mix' o similar esté habilitado en Windows.")
-
-        # 3. Códecs y Mapeo
-        cmd.extend(['-c:v', video_codec, '-preset', preset, '-crf', crf, '-pix_fmt', pix_fmt])
-        cmd.extend(['-map', f"{video_input_index}:v"])  # Mapear siempre el video
-
-        if len(audio_inputs) == 0:
-            cmd.extend(['-an'])  # Sin audio
-            print("Configurando FFmpeg sin audio.")
-        elif len(audio_inputs) == 1:
-            # Mapear la única fuente de audio directamente
-            audio_index = audio_inputs[0]['index']
-            cmd.extend(['-map', f"{audio_index}:a"])
-            cmd.extend(['-c:a', audio_codec, '-b:a', audio_bitrate])
-            print(f"Configurando FFmpeg con 1 fuente de audio (Índice: {audio_index}).")
-        elif len(audio_inputs) == 2:
-            # Mezclar las dos fuentes de audio usando amix
-            idx1 = audio_inputs[0]['index']
-            idx2 = audio_inputs[1]['index']
-            filter_complex = f"[{idx1}:a][{idx2}:a]amix=inputs=2:duration=longest[aout]"
-            cmd.extend(['-filter_complex', filter_complex])
-            cmd.extend(['-map', '[aout]'])  # Mapear la salida del filtro
-            cmd.extend(['-c:a', audio_codec, '-b:a', audio_bitrate])
-            print(f"Configurando FFmpeg con 2 fuentes de audio (Índices: {idx1}, {idx2}), mezclando con amix.")
+            logger.warning("Grabar Loopback está activado pero no se encontró/configuró dispositivo. "
+                           "Asegúrate de que 'Stereo Mix' o similar esté habilitado en Windows.")
 
-        # 4. Archivo de Salida y Opciones Finales
-        cmd.extend(['-y', output_filename])
-
-        return cmd
+        return self._build_audio_and_output(cmd, audio_indices, output_filename, video_codec_args)
 
     def start(self, output_filename: str) -> bool:
         """Inicia la grabación (Video + Audio configurado) usando FFmpeg."""
         if not self.ffmpeg_ready or self.ffmpeg_runner is None:
-            print("Error: FFmpeg no listo.", file=sys.stderr)
+            logger.error("FFmpeg no listo.")
             return False
         if self.ffmpeg_runner.process is not None:
-            print("Advertencia: Grabación ya en curso.", file=sys.stderr)
+            logger.warning("Grabación ya en curso.")
             return False
 
         cmd_args = self._get_platform_cmd_args(output_filename)
         if cmd_args is None:
-             print("Error: No se pudieron generar los argumentos de comando para FFmpeg.", file=sys.stderr)
+             logger.error("No se pudieron generar los argumentos de comando para FFmpeg.")
              return False # Plataforma no soportada o error
 
-        if self.ffmpeg_runner.start_recording(output_filename, cmd_args[1:]): # Pasar args sin el path a ffmpeg
+        return self._launch(output_filename, cmd_args)
+
+    def start_with_thumbnail(self, output_filename: str, thumb_filename: str) -> bool:
+        """Inicia la grabación y guarda el primer frame como miniatura.
+
+        Ambas salidas las escribe el mismo proceso FFmpeg: no se lanza un
+        segundo proceso para la miniatura ni se inicializa otra captura.
+        """
+        if not self.ffmpeg_ready or self.ffmpeg_runner is None:
+            logger.error("FFmpeg no listo.")
+            return False
+        if self.ffmpeg_runner.process is not None:
+            logger.warning("Grabación ya en curso.")
+            return False
+
+        cmd_args = self._get_platform_cmd_args(output_filename)
+        if cmd_args is None:
+             logger.error("No se pudieron generar los argumentos de comando para FFmpeg.")
+             return False
+
+        if sys.platform.startswith("linux") and self._get_linux_capture_backend() == 'kmsgrab':
+            # Los frames de kmsgrab están en la GPU; la miniatura necesitaría hwdownload
+            logger.warning("Miniatura no disponible con kmsgrab; se graba sin ella.")
+        else:
+            # Segunda salida tras la principal: sus opciones solo afectan a la miniatura
+            thumb_args = ('-map', '0:v', '-frames:v', '1', '-update', '1', '-y', thumb_filename)
+            if sys.platform == "win32" and self._get_windows_capture_backend() == 'ddagrab':
+                # ddagrab entrega texturas D3D11: el PNG necesita el frame en memoria
+                thumb_args = ('-map', '0:v', '-vf', 'hwdownload,format=bgra', *thumb_args[2:])
+            cmd_args += thumb_args
+
+        return self._launch(output_filename, cmd_args)
+
+    def _launch(self, output_filename: str, cmd_args: tuple[str, ...]) -> bool:
+        """Lanza FFmpeg con el comando completo y registra el archivo de salida."""
+        self._stop_requested = False
+        if self.ffmpeg_runner.start_recording(output_filename, cmd_args[1:], # Pasar args sin el path a ffmpeg
+                                              on_exit=lambda: self._on_ffmpeg_exit(output_filename)):
             self.last_output_path = output_filename
             return True
         else:
             self.last_output_path = None
             return False
 
+    def _on_ffmpeg_exit(self, output_filename: str) -> None:
+        """Llamado desde el hilo lector de stderr cuando FFmpeg termina."""
+        if not self._stop_requested:
+            logger.warning("FFmpeg terminó sin solicitar la detención: %s", output_filename)
+            self.signals.finished.emit(output_filename)
+
     def pause(self) -> None:
         """Pausa la grabación (Placeholder)."""
-        print("Recorder: Pausa no implementada.")
+        logger.info("Pausa no implementada.")
 
     def resume(self) -> None:
         """Reanuda la grabación (Placeholder)."""
-        print("Recorder: Reanudar no implementado.")
+        logger.info("Reanudar no implementado.")
+
+    def is_recording(self) -> bool:
+        """Indica si el proceso de FFmpeg sigue grabando (no bloquea)."""
+        return self.ffmpeg_runner is not None and self.ffmpeg_runner.is_running()
 
     def stop(self) -> str | None:
         """Detiene la grabación activa de FFmpeg."""
         if not self.ffmpeg_ready or self.ffmpeg_runner is None:
-            print("Error: FFmpeg no listo.", file=sys.stderr)
+            logger.error("FFmpeg no listo.")
             return None
         if self.ffmpeg_runner.process is None:
-            print("Advertencia: No había grabación activa.")
+            logger.warning("No había grabación activa.")
             return None
 
-        print("Solicitando detención al FFmpegRunner...")
+        logger.debug("Solicitando detención al FFmpegRunner...")
+        self._stop_requested = True
         if self.ffmpeg_runner.stop_recording():
-            print("Recorder: Detención completada.")
+            logger.info("Detención completada.")
             stopped_path = self.last_output_path
             self.last_output_path = None
             return stopped_path
         else:
-            print("Recorder Error: Problemas al detener FFmpeg.", file=sys.stderr)
+            logger.error("Problemas al detener FFmpeg.")
             self.last_output_path = None
             return None
 
+    def _check_screenshot_target(self, output_filename: str) -> bool:
+        """Comprueba que FFmpeg esté listo y que la extensión de la captura sea válida."""
+        if not self.ffmpeg_ready or self.ffmpeg_path is None:
+            logger.error("FFmpeg no listo para captura de pantalla.")
+            return False
+            
+        # Verificar que la extensión sea compatible
+        ext = os.path.splitext(output_filename)[1].lower()
+        if ext not in ['.png', '.jpg', '.jpeg']:
+            logger.error("Formato no soportado para captura: %s. Use .png, .jpg o .jpeg", ext)
+            return False
+        return True
+
     def take_screenshot(self, output_filename: str, select_area: bool = False) -> str | None:
         """Captura una imagen de la pantalla completa o de un área seleccionada.
         
@@ -421,47 +982,48 @@ class Recorder:
         Returns:
             La ruta donde se guardó la captura o None si hubo un error
         """
-        if not self.ffmpeg_ready or self.ffmpeg_path is None:
-            print("Error: FFmpeg no listo para captura de pantalla.", file=sys.stderr)
-            return None
-            
-        # Verificar que la extensión sea compatible
-        ext = os.path.splitext(output_filename)[1].lower()
-        if ext not in ['.png', '.jpg', '.jpeg']:
-            print(f"Error: Formato no soportado para captura: {ext}. Use .png, .jpg o .jpeg", file=sys.stderr)
+        if not self._check_screenshot_target(output_filename):
             return None
         
         # Si se solicita selección de área, importar e iniciar el diálogo mejorado
         selected_rect = None
+        selected_pixmap = None
         if select_area:
             try:
                 # Usar la implementación mejorada de area_selection.py
                 from ..gui.area_selection import AreaSelectionDialog as EnhancedAreaSelectionDialog
-                selected_rect = EnhancedAreaSelectionDialog.get_area_selection()
-                if not selected_rect:
-                    print("Selección de área cancelada por el usuario")
+                selection = EnhancedAreaSelectionDialog.select_area()
+                if not selection:
+                    logger.info("Selección de área cancelada por el usuario")
                     return None
-                print(f"Área seleccionada: {selected_rect.width()}x{selected_rect.height()} en posición ({selected_rect.x()}, {selected_rect.y()})")
+                selected_rect, selected_pixmap = selection
+                logger.info("Área seleccionada: %sx%s en posición (%s, %s)", selected_rect.width(), selected_rect.height(), selected_rect.x(), selected_rect.y())
             except ImportError as e:
-                print(f"No se pudo importar AreaSelectionDialog mejorado: {e}", file=sys.stderr)
+                logger.error("No se pudo importar AreaSelectionDialog mejorado: %s", e)
                 # Fallback a la implementación local
                 selected_rect = AreaSelectionDialog.get_area_selection()
                 if not selected_rect:
-                    print("Selección de área cancelada por el usuario")
+                    logger.info("Selección de área cancelada por el usuario")
                     return None
         
-        # Determinar parámetros según plataforma
-        is_linux = sys.platform.startswith('linux')
+        # El diálogo mejorado ya capturó la pantalla al abrirse: guardar el
+        # recorte sin volver a capturar
+        if selected_pixmap is not None and not selected_pixmap.isNull():
+            saved = self._run_screenshot_job(
+                _ImageSaveJob(selected_pixmap.toImage(), output_filename, "de área seleccionada ")
+            )
+            if saved:
+                return saved
         
-        # Si tenemos área seleccionada y estamos en Linux, podemos usar el método de captura directa de Qt
-        if select_area and selected_rect:
-            try:
-                # Intentar primero con el método Qt que funciona en todas las plataformas
-                screen = QApplication.primaryScreen()
-                if not screen:
-                    print("Error: No se pudo acceder a la pantalla primaria", file=sys.stderr)
-                    return None
-                
+        # Intentar primero la captura directa de Qt (en proceso, sin lanzar FFmpeg)
+        # tanto para el área seleccionada como para la pantalla completa
+        try:
+            screen = QApplication.primaryScreen()
+            if not screen:
+                logger.error("No se pudo acceder a la pantalla primaria")
+                return None
+            
+            if selected_rect:
                 pixmap = screen.grabWindow(
                     0,  # Capturar toda la pantalla (0 = desktop)
                     selected_rect.x(), 
@@ -469,125 +1031,146 @@ class Recorder:
                     selected_rect.width(), 
                     selected_rect.height()
                 )
-                
-                if pixmap and not pixmap.isNull():
-                    if pixmap.save(output_filename):
-                        print(f"Captura de área seleccionada guardada en: {output_filename}")
-                        return output_filename
-                    else:
-                        print(f"Error al guardar la captura: {output_filename}", file=sys.stderr)
-                else:
-                    print("Error al capturar el área seleccionada", file=sys.stderr)
-            except Exception as e:
-                print(f"Error con método Qt de captura: {e}", file=sys.stderr)
+            else:
+                pixmap = screen.grabWindow(0)
+            
+            area_text = "de área seleccionada " if selected_rect else ""
+            if pixmap and not pixmap.isNull():
+                # La captura es rápida; la codificación PNG se hace fuera del hilo de la GUI
+                saved = self._run_screenshot_job(
+                    _ImageSaveJob(pixmap.toImage(), output_filename, area_text)
+                )
+                if saved:
+                    return saved
+            else:
+                logger.error("Error al capturar la pantalla %scon Qt", area_text)
+        except Exception as e:
+            logger.error("Error con método Qt de captura: %s", e)
         
-        # Si la captura con Qt falló o no tenemos área seleccionada, usar FFmpeg
+        # Si la captura con Qt falló (p. ej. en Wayland), usar FFmpeg
         try:
-            # Generar comando FFmpeg base
-            cmd = [
-                self.ffmpeg_path,
-                "-f", "x11grab" if is_linux else "gdigrab",
-                "-framerate", "1",  # Solo necesitamos un frame
-            ]
-            
-            # Configurar parámetros según plataforma y si hay área seleccionada
-            if is_linux:
-                # Linux con x11grab
-                if select_area and selected_rect:
-                    # Agregar parámetros para área seleccionada
-                    cmd.extend([
-                        "-video_size", f"{selected_rect.width()}x{selected_rect.height()}",
-                        "-i", f":0.0+{selected_rect.x()},{selected_rect.y()}"
-                    ])
-                else:
-                    # Captura completa
-                    from subprocess import check_output
-                    try:
-                        # Obtener resolución de pantalla
-                        xrandr_output = check_output(["xrandr"]).decode()
-                        import re
-                        match = re.search(r'connected primary (\d+x\d+)', xrandr_output)
-                        if match:
-                            resolution = match.group(1)
-                        else:
-                            match = re.search(r'(\d+x\d+) \+', xrandr_output)
-                            resolution = match.group(1) if match else "1920x1080"
-                        print(f"Resolución detectada para captura: {resolution}")
-                    except Exception as e:
-                        print(f"Error detectando resolución: {e}, usando valor por defecto")
-                        resolution = "1920x1080"
-                        
-                    cmd.extend(["-video_size", resolution])
-                    cmd.extend(["-i", ":0.0"])
+            cmd = self._build_screenshot_cmd(output_filename, selected_rect)
+        except Exception as e:
+            logger.error("Error al capturar pantalla: %s", e)
+            return None
+        logger.debug("Ejecutando comando para captura de pantalla: %s", ' '.join(cmd))
+        return self._run_screenshot_job(_ScreenshotJob(self, cmd, output_filename, selected_rect))
+
+    @staticmethod
+    def _run_screenshot_job(job: _ScreenshotJob | _ImageSaveJob) -> str | None:
+        """Ejecuta la captura en el QThreadPool y espera su resultado.
+
+        La espera se hace con un QEventLoop local: la interfaz sigue
+        repintándose y atendiendo eventos mientras FFmpeg trabaja o la
+        imagen se codifica.
+        """
+        if QApplication.instance() is None:
+            # Sin bucle de eventos de Qt: ejecutar en el hilo actual
+            result = []
+            job.signals.done.connect(result.append, Qt.DirectConnection)
+            job.run()
+            return result[0] if result else None
+
+        result = []
+        loop = QEventLoop()
+
+        def on_done(path: str | None) -> None:
+            result.append(path)
+            loop.quit()
+
+        job.signals.done.connect(on_done, Qt.QueuedConnection)
+        job.setAutoDelete(False)  # 'job.signals' debe seguir vivo hasta recibir la señal
+        QThreadPool.globalInstance().start(job)
+        loop.exec()
+        return result[0] if result else None
+
+    def _build_screenshot_cmd(self, output_filename: str, selected_rect: QRect | None) -> list[str]:
+        """Genera el comando FFmpeg que captura un solo frame de la pantalla."""
+        is_linux = sys.platform.startswith('linux')
+        cmd = [
+            self.ffmpeg_path,
+            *QUIET_ARGS,
+            "-f", "x11grab" if is_linux else "gdigrab",
+            "-framerate", "1",  # Solo necesitamos un frame
+        ]
+        
+        # Configurar parámetros según plataforma y si hay área seleccionada
+        if is_linux:
+            # Linux con x11grab
+            if selected_rect:
+                # Agregar parámetros para área seleccionada
+                cmd.extend([
+                    "-video_size", f"{selected_rect.width()}x{selected_rect.height()}",
+                    "-i", f":0.0+{selected_rect.x()},{selected_rect.y()}"
+                ])
             else:
-                # Windows con gdigrab
-                if select_area and selected_rect:
-                    # Agregar parámetros para área seleccionada en Windows
-                    cmd.extend([
-                        "-offset_x", str(selected_rect.x()),
-                        "-offset_y", str(selected_rect.y()),
-                        "-video_size", f"{selected_rect.width()}x{selected_rect.height()}",
-                        "-i", "desktop"
-                    ])
-                else:
-                    # Captura completa
-                    cmd.extend(["-i", "desktop"])
-            
-            # Finalizar comando común
-            cmd.extend([
-                "-frames:v", "1",   # Capturar solo 1 frame
-                "-y",               # Sobrescribir sin preguntar
-                output_filename
-            ])
-            
-            print(f"Ejecutando comando para captura de pantalla: {' '.join(cmd)}")
-            
-            # Ejecutar el comando
-            import subprocess
-            result = subprocess.run(cmd, capture_output=True, text=True, check=False)
+                # Captura completa
+                resolution = self._detect_x11_resolution()
+                cmd.extend(["-video_size", resolution])
+                cmd.extend(["-i", ":0.0"])
+        else:
+            # Windows con gdigrab
+            if selected_rect:
+                # Agregar parámetros para área seleccionada en Windows
+                cmd.extend([
+                    "-offset_x", str(selected_rect.x()),
+                    "-offset_y", str(selected_rect.y()),
+                    "-video_size", f"{selected_rect.width()}x{selected_rect.height()}",
+                    "-i", "desktop"
+                ])
+            else:
+                # Captura completa
+                cmd.extend(["-i", "desktop"])
+        
+        # Finalizar comando común
+        cmd.extend([
+            "-frames:v", "1",   # Capturar solo 1 frame
+            "-y",               # Sobrescribir sin preguntar
+            output_filename
+        ])
+        return cmd
+
+    def _finish_screenshot(self, output_filename: str, returncode: int, stderr: str,
+                           selected_rect: QRect | None) -> str | None:
+        """Comprueba el resultado de FFmpeg y, en Linux, prueba herramientas alternativas."""
+        if returncode != 0:
+            logger.error("Error en FFmpeg (código %s). Salida de error: %s", returncode, stderr)
             
-            if result.returncode != 0:
-                print(f"Error en FFmpeg (código {result.returncode}):", file=sys.stderr)
-                print(f"Salida de error: {result.stderr}", file=sys.stderr)
-                
-                # Si falla con x11grab, intentar con alternativas
-                if is_linux:
-                    print("Intentando método alternativo...")
-                    try:
-                        alt_cmd = None
-                        if select_area and selected_rect:
-                            # Para área seleccionada intentar con otras herramientas
-                            if subprocess.run(["which", "gnome-screenshot"], capture_output=True).returncode == 0:
-                                alt_cmd = ["gnome-screenshot", "-a", "-f", output_filename]
-                            elif subprocess.run(["which", "scrot"], capture_output=True).returncode == 0:
-                                alt_cmd = ["scrot", "-s", output_filename]
-                            elif subprocess.run(["which", "import"], capture_output=True).returncode == 0:
-                                # ImageMagick import
-                                alt_cmd = ["import", output_filename]
-                        else:
-                            # Para pantalla completa
-                            if subprocess.run(["which", "scrot"], capture_output=True).returncode == 0:
-                                alt_cmd = ["scrot", output_filename]
-                            elif subprocess.run(["which", "gnome-screenshot"], capture_output=True).returncode == 0:
-                                alt_cmd = ["gnome-screenshot", "-f", output_filename]
-                                
-                        if alt_cmd:
-                            print(f"Ejecutando alternativa: {' '.join(alt_cmd)}")
-                            subprocess.run(alt_cmd, check=True)
-                            if os.path.exists(output_filename):
-                                return output_filename
-                    except Exception as e:
-                        print(f"Error con método alternativo: {e}", file=sys.stderr)
-                
-                return None
+            # Si falla con x11grab, intentar con alternativas
+            if sys.platform.startswith('linux'):
+                logger.info("Intentando método alternativo...")
+                try:
+                    alt_cmd = None
+                    tools = self._screenshot_tools
+                    if selected_rect:
+                        # Para área seleccionada intentar con otras herramientas
+                        if tools["gnome-screenshot"]:
+                            alt_cmd = [tools["gnome-screenshot"], "-a", "-f", output_filename]
+                        elif tools["scrot"]:
+                            alt_cmd = [tools["scrot"], "-s", output_filename]
+                        elif tools["import"]:
+                            # ImageMagick import
+                            alt_cmd = [tools["import"], output_filename]
+                    else:
+                        # Para pantalla completa
+                        if tools["scrot"]:
+                            alt_cmd = [tools["scrot"], output_filename]
+                        elif tools["gnome-screenshot"]:
+                            alt_cmd = [tools["gnome-screenshot"], "-f", output_filename]
+                            
+                    if alt_cmd:
+                        logger.debug("Ejecutando alternativa: %s", ' '.join(alt_cmd))
+                        subprocess.run(alt_cmd, check=True)
+                        if os.path.exists(output_filename):
+                            return output_filename
+                except Exception as e:
+                    logger.error("Error con método alternativo: %s", e)
             
-            if os.path.exists(output_filename):
-                print(f"Captura de pantalla guardada en: {output_filename}")
-                return output_filename
-            else:
-                print(f"Error: No se pudo crear el archivo {output_filename}", file=sys.stderr)
-                return None
-                
-        except Exception as e:
-            print(f"Error al capturar pantalla: {e}", file=sys.stderr)
-            return None
\ No newline at end of file
+            return None
+        
+        if os.path.exists(output_filename):
+            logger.info("Captura de pantalla guardada en: %s", output_filename)
+            return output_filename
+        else:
+            logger.error("No se pudo crear el archivo %s", output_filename)
+            return None
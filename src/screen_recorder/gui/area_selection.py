@@ -5,8 +5,13 @@ Componente para seleccionar un área específica de la pantalla para captura.
 """
 
 from PySide6.QtWidgets import QDialog, QApplication
-from PySide6.QtGui import QPainter, QColor, QPixmap
-from PySide6.QtCore import Qt, QPoint, QRect
+from PySide6.QtGui import QPainter, QColor, QPixmap, QStaticText, QTransform
+from PySide6.QtCore import Qt, QPoint, QRect, QRectF, QTimer
+
+# Capa semi-transparente sobre la captura de fondo
+OVERLAY_COLOR = QColor(0, 0, 0, 128)
+# Zona de los textos de ayuda (se repinta cuando cambian las dimensiones)
+TEXT_AREA = QRect(0, 0, 520, 100)
 
 class AreaSelectionDialog(QDialog):
     """Diálogo mejorado para seleccionar un área de la pantalla para captura."""
@@ -18,43 +23,89 @@ class AreaSelectionDialog(QDialog):
         self.setCursor(Qt.CrossCursor)
         
         # Cubrir toda la pantalla disponible
-        available_geometry = QApplication.primaryScreen().availableGeometry()
+        screen = QApplication.primaryScreen()
+        available_geometry = screen.availableGeometry()
         self.setGeometry(available_geometry)
         
-        # Capturar la pantalla completa para mostrar como fondo
-        self.screen_pixmap = QApplication.primaryScreen().grabWindow(0)
+        # Capturar la pantalla completa para mostrar como fondo. La misma
+        # captura sirve después para recortar el área elegida (ver
+        # selected_pixmap), así que no hace falta volver a capturar
+        self.screen_pixmap = screen.grabWindow(0)
+        # La captura está en píxeles físicos; los eventos de pintado en lógicos.
+        # Además el diálogo empieza en el área disponible (sin paneles), no en
+        # la esquina de la pantalla
+        self._dpr = self.screen_pixmap.devicePixelRatio()
+        self._offset = available_geometry.topLeft() - screen.geometry().topLeft()
+        
+        # Fondo oscurecido precalculado: el pintado es un único blit por región
+        self._darkened = self.screen_pixmap.copy()
+        darken_painter = QPainter(self._darkened)
+        darken_painter.fillRect(self._darkened.rect(), OVERLAY_COLOR)
+        darken_painter.end()
         
         # Variables para seguimiento de selección
         self.start_point = QPoint()
         self.end_point = QPoint()
         self.is_selecting = False
         self.selection_rect = QRect()
+        # Selección normalizada en curso; se recalcula solo cuando cambian los extremos
+        self._sel_rect = QRect()
         
         # Mensaje de instrucción
         self.instruction_text = "Haz clic y arrastra para seleccionar el área a capturar"
         self.dimension_text = "Dimensiones: 0 × 0"
         self.cancel_text = "Presiona ESC para cancelar"
         
+        # Los textos fijos se maquetan una sola vez; solo la línea de
+        # dimensiones se vuelve a maquetar en cada repintado
+        self._instruction_static = QStaticText(self.instruction_text)
+        self._cancel_static = QStaticText(self.cancel_text)
+        self._instruction_static.prepare(QTransform(), self.font())
+        self._cancel_static.prepare(QTransform(), self.font())
+        
+        # Repintado limitado a la frecuencia de refresco de la pantalla: un ratón
+        # puede enviar cientos de movimientos por segundo y solo el último
+        # importa en cada refresco
+        self._painted_rect = QRect()
+        self._paint_timer = QTimer(self)
+        self._paint_timer.setSingleShot(True)
+        self._paint_timer.setTimerType(Qt.PreciseTimer)
+        self._paint_timer.timeout.connect(self._flush_update)
+        self._refresh_ms = max(1, int(1000 / (screen.refreshRate() or 60.0)))
+        
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
             self.start_point = event.pos()
             self.end_point = self.start_point
             self.is_selecting = True
+            self._sel_rect = QRect(self.start_point, self.end_point).normalized()
+            self._painted_rect = self._sel_rect
             self.update()
     
     def mouseMoveEvent(self, event):
         if self.is_selecting:
             self.end_point = event.pos()
-            # Actualizar texto de dimensiones
-            select_rect = QRect(self.start_point, self.end_point).normalized()
-            self.dimension_text = f"Dimensiones: {select_rect.width()} × {select_rect.height()}"
-            self.update()
+            self._sel_rect = QRect(self.start_point, self.end_point).normalized()
+            if not self._paint_timer.isActive():
+                self._paint_timer.start(self._refresh_ms)
+    
+    def _flush_update(self) -> None:
+        """Actualiza las dimensiones y repinta lo que cambió desde el último refresco."""
+        select_rect = self._sel_rect
+        self.dimension_text = f"Dimensiones: {select_rect.width()} × {select_rect.height()}"
+        # Solo cambia la unión de la selección anterior y la nueva (con
+        # margen para el borde) y la zona de los textos
+        self.update(self._painted_rect.united(select_rect).adjusted(-2, -2, 2, 2))
+        self.update(TEXT_AREA)
+        self._painted_rect = select_rect
     
     def mouseReleaseEvent(self, event):
         if event.button() == Qt.LeftButton and self.is_selecting:
+            self._paint_timer.stop()
             self.end_point = event.pos()
             self.is_selecting = False
-            self.selection_rect = QRect(self.start_point, self.end_point).normalized()
+            self._sel_rect = QRect(self.start_point, self.end_point).normalized()
+            self.selection_rect = self._sel_rect
             # Si la selección es demasiado pequeña, no la aceptamos
             if self.selection_rect.width() > 10 and self.selection_rect.height() > 10:
                 self.accept()
@@ -67,44 +118,69 @@ class AreaSelectionDialog(QDialog):
         if event.key() == Qt.Key_Escape:
             self.reject()
     
+    def _to_pixmap_rect(self, rect: QRect) -> QRect:
+        """Convierte un rectángulo del widget a píxeles físicos de la captura."""
+        rect = rect.translated(self._offset)
+        if self._dpr == 1:
+            return rect
+        dpr = self._dpr
+        return QRect(round(rect.x() * dpr), round(rect.y() * dpr),
+                     round(rect.width() * dpr), round(rect.height() * dpr))
+    
     def paintEvent(self, event):
         """Dibuja la interfaz de selección de área con la captura de pantalla de fondo."""
         painter = QPainter(self)
+        dirty = event.rect()
         
-        # Dibujar la captura de pantalla como fondo
-        painter.drawPixmap(self.rect(), self.screen_pixmap)
-        
-        # Aplicar una capa semi-transparente sobre toda la pantalla
-        overlay_color = QColor(0, 0, 0, 128)  # RGBA: negro semi-transparente
-        painter.fillRect(self.rect(), overlay_color)
+        # Fondo ya oscurecido, solo en la región a repintar
+        painter.drawPixmap(dirty, self._darkened, self._to_pixmap_rect(dirty))
         
         # Mostrar el área seleccionada (transparente)
         if self.is_selecting or not self.selection_rect.isEmpty():
-            select_rect = QRect(self.start_point, self.end_point).normalized()
+            select_rect = self._sel_rect
             
-            # Mostrar la parte de la captura original en la selección
-            painter.setCompositionMode(QPainter.CompositionMode_Source)
-            painter.drawPixmap(select_rect, self.screen_pixmap, select_rect)
+            # Mostrar la parte de la captura original en la selección. Un
+            # fragmento se posiciona por su centro y se escala desde píxeles
+            # físicos de la captura a píxeles lógicos del widget
+            visible = select_rect.intersected(dirty)
+            if not visible.isEmpty():
+                fragment = QPainter.PixmapFragment.create(
+                    QRectF(visible).center(), QRectF(self._to_pixmap_rect(visible)),
+                    1 / self._dpr, 1 / self._dpr)
+                painter.drawPixmapFragments([fragment], 1, self.screen_pixmap)
             
             # Dibujar un borde alrededor de la selección
-            painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
             painter.setPen(QColor(255, 255, 255, 200))  # Blanco semi-transparente
             painter.drawRect(select_rect)
         
         # Dibujar instrucciones y dimensiones
         painter.setPen(QColor(255, 255, 255, 255))
-        painter.drawText(10, 30, self.instruction_text)
+        # QStaticText se posiciona por la esquina superior, no por la línea base
+        ascent = painter.fontMetrics().ascent()
+        painter.drawStaticText(10, 30 - ascent, self._instruction_static)
         painter.drawText(10, 60, self.dimension_text)
-        painter.drawText(10, 90, self.cancel_text)
+        painter.drawStaticText(10, 90 - ascent, self._cancel_static)
     
     def get_selection(self):
         """Retorna el rectángulo de selección."""
         return self.selection_rect
     
+    def selected_pixmap(self) -> QPixmap:
+        """Recorta el área seleccionada de la captura tomada al abrir el diálogo."""
+        return self.screen_pixmap.copy(self._to_pixmap_rect(self.selection_rect))
+    
     @staticmethod
     def get_area_selection():
         """Método estático para mostrar el diálogo y obtener la selección."""
         dialog = AreaSelectionDialog()
         if dialog.exec() == QDialog.Accepted:
             return dialog.get_selection()
+        return None
+    
+    @staticmethod
+    def select_area():
+        """Muestra el diálogo y devuelve (rectángulo, imagen del área) o None si se cancela."""
+        dialog = AreaSelectionDialog()
+        if dialog.exec() == QDialog.Accepted:
+            return dialog.get_selection(), dialog.selected_pixmap()
         return None
\ No newline at end of file
@@ -1,12 +1,14 @@
 # src/screen_recorder/gui/main_window.py
 
-import sys
 import os
+import time
+import logging
+import platform
+import subprocess
 from enum import Enum, auto
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from PySide6.QtWidgets import (
-    QApplication,
     QMainWindow,
     QPushButton,
     QWidget,
@@ -16,13 +18,106 @@ from PySide6.QtWidgets import (
     QFileDialog,
     QMessageBox,
 )
-from PySide6.QtCore import QSize, Slot, QTimer
-from PySide6.QtGui import QIcon # Opcional para iconos
+from PySide6.QtCore import Qt, QSize, Slot, QTimer, QThreadPool
 
 # Asegurar import correcto
 from screen_recorder.core.recorder import Recorder
 from screen_recorder.core import config_manager
-from screen_recorder.core import audio_utils # Importar para acceso a nombres default si fuera necesario
+from screen_recorder.gui.workers import DeviceRefreshWorker, RecorderInitWorker
+
+logger = logging.getLogger('screen_recorder.gui')
+
+# Intervalo del temporizador de grabación: la etiqueta solo cambia una vez por
+# segundo, pero muestrear con más frecuencia hace que el cambio de segundo se
+# vea como mucho 250 ms tarde (los ticks sin cambio no repintan nada)
+TIMER_REFRESH_MS = 250
+# Segundos durante los que se reutiliza la comprobación de la carpeta de salida
+# (cada os.path.isdir es un stat(), lento en unidades de red)
+OUTPUT_DIR_CHECK_TTL = 2.0
+# Espera antes de escribir en disco los cambios de configuración
+CONFIG_SAVE_DELAY_MS = 500
+# Espera tras ocultar la ventana antes de abrir la selección de área: margen
+# para que el compositor la retire antes de capturar el fondo del diálogo
+HIDE_DELAY_MS = 150
+
+# Sistema operativo ('linux', 'windows', 'darwin'...): no cambia durante la ejecución
+_SYSTEM = platform.system().lower()
+
+# Ayuda para capturar el audio del sistema: depende solo del sistema operativo,
+# así que se elige una vez al importar el módulo
+_AUDIO_HELP_TITLE = "Configuración de Audio del Sistema"
+_AUDIO_HELP_BY_SYSTEM = {
+    "linux": (
+        "<h3>Cómo habilitar la captura de audio del sistema en Linux</h3>"
+        "<p><b>Para sistemas con PulseAudio (la mayoría de distribuciones):</b></p>"
+        "<ol>"
+        "<li>Instala pavucontrol si no lo tienes:<br>"
+        "<code>sudo apt install pavucontrol</code></li>"
+        "<li>Abre Control de Volumen de PulseAudio (pavucontrol)</li>"
+        "<li>Ve a la pestaña <b>Dispositivos de entrada</b></li>"
+        "<li>Cambia el selector 'Mostrar:' a <b>Todos los dispositivos de entrada</b></li>"
+        "<li>Deberías ver uno o más dispositivos llamados 'Monitor of...'</li>"
+        "<li>Asegúrate de que no estén silenciados (icono de altavoz tachado)</li>"
+        "</ol>"
+        "<p><b>Después de seguir estos pasos:</b></p>"
+        "<ol>"
+        "<li>Reinicia esta aplicación</li>"
+        "<li>El dispositivo 'Monitor of...' debería aparecer automáticamente</li>"
+        "</ol>"
+        "<p><b>Nota:</b> Para grabar audio del sistema mientras se reproduce, debes asegurarte de estar usando el dispositivo de salida cuyo 'Monitor' quieres capturar.</p>"
+    ),
+    "windows": (
+        "<h3>Cómo habilitar Stereo Mix en Windows</h3>"
+        "<p>Para capturar el audio del sistema en Windows, necesitas habilitar 'Stereo Mix':</p>"
+        "<ol>"
+        "<li>Haz clic derecho en el icono de volumen en la barra de tareas</li>"
+        "<li>Selecciona 'Sonidos' o 'Configuración de sonido'</li>"
+        "<li>Ve a la pestaña 'Grabación'</li>"
+        "<li>Haz clic derecho en un área vacía y marca 'Mostrar dispositivos deshabilitados'</li>"
+        "<li>Debería aparecer 'Stereo Mix' (o un nombre similar como 'Lo que escuchas', 'What U Hear', etc.)</li>"
+        "<li>Haz clic derecho en 'Stereo Mix' y selecciona 'Habilitar'</li>"
+        "<li>Haz clic derecho de nuevo y selecciona 'Establecer como dispositivo predeterminado'</li>"
+        "</ol>"
+        "<p><b>Si no ves Stereo Mix:</b></p>"
+        "<ul>"
+        "<li>Tu tarjeta de sonido podría no soportarlo</li>"
+        "<li>Prueba actualizar los controladores de audio</li>"
+        "<li>Como alternativa, puedes usar software como 'Voicemeeter' o 'Virtual Audio Cable'</li>"
+        "</ul>"
+        "<p><b>Después de seguir estos pasos:</b></p>"
+        "<ol>"
+        "<li>Reinicia esta aplicación</li>"
+        "<li>El dispositivo 'Stereo Mix' debería aparecer automáticamente</li>"
+        "</ol>"
+    ),
+}
+# macOS u otros
+_AUDIO_HELP_OTHER = (
+    "<h3>Configuración de Audio del Sistema</h3>"
+    "<p>Tu sistema operativo necesita pasos especiales para capturar el audio del sistema:</p>"
+    "<ul>"
+    "<li>En macOS, necesitas instalar software adicional como 'Soundflower', 'BlackHole', 'Loopback', etc.</li>"
+    "<li>En otros sistemas, busca herramientas específicas que permitan capturar el audio del sistema</li>"
+    "</ul>"
+    "<p>Consulta la documentación en línea para tu sistema operativo específico.</p>"
+)
+_AUDIO_HELP_HTML = _AUDIO_HELP_BY_SYSTEM.get(_SYSTEM, _AUDIO_HELP_OTHER)
+
+# Textos del estado de audio, indexados por "captura activada"
+_NO_DEVICE_TEXT = "No encontrado/Default"
+_MIC_TEMPLATES = {True: "Micrófono: ACT ({})", False: "Micrófono: OFF ({})"}
+_LOOP_TEMPLATES = {True: "Audio Sistema: ACT ({})", False: "Audio Sistema: OFF ({})"}
+_LOOP_MISSING_TEMPLATE = _LOOP_TEMPLATES[True] + " (Revisa si 'Stereo Mix' está habilitado)"
+
+def _set_text(widget, text: str) -> None:
+    """Cambia el texto solo si es distinto (evita invalidar y repintar el widget)."""
+    if widget.text() != text:
+        widget.setText(text)
+
+def _set_enabled(widget, enabled: bool) -> None:
+    """Habilita o deshabilita el widget solo si cambia su estado."""
+    if widget.isEnabled() != enabled:
+        widget.setEnabled(enabled)
 
 class State(Enum):
     IDLE = auto()
@@ -35,25 +130,72 @@ class MainWindow(QMainWindow):
 
         self._state: State = State.IDLE
         self.config = config_manager.load_config()
-        self.output_dir: str | None = self.config.get("output_dir")
-
-        # Crear instancia del Recorder (ahora usa config para audio y ffmpeg)
-        self.recorder = Recorder(self.config)
-        self.ffmpeg_ok = self.recorder.ffmpeg_ready
+        # (ruta, instante de la comprobación, es directorio) de la última comprobación
+        self._outdir_valid_cache: tuple[str, float, bool] | None = None
+        self.output_dir = self.config.get("output_dir")  # Calcula también el texto de la etiqueta
+
+        # El Recorder (búsqueda de FFmpeg y de dispositivos) se crea en segundo
+        # plano para que la ventana aparezca de inmediato; hasta entonces los
+        # botones que lo usan quedan deshabilitados (ver _on_recorder_ready)
+        self.recorder: Recorder | None = None
+        self.ffmpeg_ok = False
+        # Última enumeración de dispositivos ({'input': [...], 'output': [...]})
+        self.audio_devices: dict | None = None
+        self._refreshing_devices: bool = True  # Primera detección en curso
+        self._taking_screenshot: bool = False  # Captura en curso (bloquea reentradas)
+
+        # Los cambios de configuración se guardan en disco tras CONFIG_SAVE_DELAY_MS
+        # sin cambios nuevos: varios cambios seguidos son una sola escritura
+        self._config_save_timer = QTimer(self)
+        self._config_save_timer.setSingleShot(True)
+        self._config_save_timer.setInterval(CONFIG_SAVE_DELAY_MS)
+        self._config_save_timer.timeout.connect(self._save_config)
 
         self.record_timer = QTimer(self)
-        self.record_timer.setInterval(1000)
+        self.record_timer.setInterval(int(self.config.get("timer_refresh_ms", TIMER_REFRESH_MS)))
         self.record_timer.timeout.connect(self._update_timer_display)
-        self.elapsed_seconds: int = 0
+        # Inicio de la grabación (reloj monotónico): el tiempo mostrado se
+        # recalcula en cada tick, así los ticks retrasados no acumulan error
+        self._record_start: float = 0.0
+        self._last_time_str: str = "00:00:00"
+        # Diálogos (captura de pantalla, ayuda, carpeta de salida): se crean al
+        # usarse por primera vez y se reutilizan
+        self._shot_type_box: QMessageBox | None = None
+        self._shot_result_box: QMessageBox | None = None
+        self._audio_help_box: QMessageBox | None = None
+        self._dir_dialog: QFileDialog | None = None
 
         self.setWindowTitle("Capturador de Audio y Video")
         self.resize(QSize(550, 250)) # Un poco más grande
 
         self._setup_ui()
         self._connect_signals()
+        self._set_state(State.IDLE) # Estado inicial
+
+        worker = RecorderInitWorker(self.config)
+        worker.signals.finished.connect(self._on_recorder_ready)
+        worker.signals.error.connect(self._on_recorder_error)
+        QThreadPool.globalInstance().start(worker)
+
+    @Slot(object)
+    def _on_recorder_ready(self, recorder: Recorder) -> None:
+        """Recibe el Recorder creado en segundo plano y habilita la interfaz."""
+        self.recorder = recorder
+        self.ffmpeg_ok = recorder.ffmpeg_ready
+        recorder.connect_screen_signals()  # Se creó fuera del hilo de la GUI
+        recorder.signals.finished.connect(self._on_recording_ended_unexpectedly)
+        self._refreshing_devices = False
         self._check_ffmpeg_status()
         self._update_audio_status_labels() # Actualizar etiquetas de audio iniciales
-        self._set_state(State.IDLE) # Estado inicial
+        self._set_state(self._state)
+
+    @Slot(str)
+    def _on_recorder_error(self, message: str) -> None:
+        """Informa de un error al crear el Recorder (la grabación queda deshabilitada)."""
+        logger.error("Error al inicializar el grabador: %s", message)
+        self._refreshing_devices = False
+        self._check_ffmpeg_status()
+        self._set_state(self._state)
 
     def _setup_ui(self) -> None:
         """Crea y organiza los widgets de la interfaz."""
@@ -73,10 +215,12 @@ class MainWindow(QMainWindow):
         self.screenshot_button = QPushButton("📷 Captura")
         self.output_dir_button = QPushButton("Carpeta Salida...")
         self.help_audio_button = QPushButton("❓ Ayuda Audio")
+        self.refresh_devices_button = QPushButton("🔄 Dispositivos")
         
         self.pause_button.setEnabled(False)
         self.pause_button.setToolTip("La pausa no está implementada en esta versión.")
         self.screenshot_button.setToolTip("Toma una captura de la pantalla completa")
+        self.refresh_devices_button.setToolTip("Vuelve a detectar los dispositivos de audio")
 
         # --- Layouts ---
         button_layout = QHBoxLayout()
@@ -95,6 +239,7 @@ class MainWindow(QMainWindow):
         audio_info_layout.addWidget(self.mic_status_label)
         audio_info_layout.addWidget(self.loopback_status_label)
         audio_layout.addLayout(audio_info_layout)
+        audio_layout.addWidget(self.refresh_devices_button)
         audio_layout.addWidget(self.help_audio_button)
 
         # Layout para info de estado y audio
@@ -122,6 +267,7 @@ class MainWindow(QMainWindow):
         self.output_dir_button.clicked.connect(self._select_output_dir)
         self.help_audio_button.clicked.connect(self._show_audio_help)
         self.screenshot_button.clicked.connect(self._on_screenshot_clicked)
+        self.refresh_devices_button.clicked.connect(self._on_refresh_devices_clicked)
         # self.pause_button.clicked.connect(...) # Sigue desconectado
 
     def _check_ffmpeg_status(self) -> None:
@@ -133,7 +279,7 @@ class MainWindow(QMainWindow):
                 (f"No se pudo encontrar o inicializar FFmpeg.\n"
                  f"La grabación no funcionará.\n\n"
                  f"Instálalo y asegúrate de que esté en el PATH,\n"
-                 f"o configura la ruta en:\n{config_manager.config_file}")
+                 f"o configura la ruta en:\n{config_manager.get_config_path()}")
             )
             self.record_button.setEnabled(False)
             self.record_button.setToolTip("FFmpeg no encontrado o no configurado.")
@@ -141,26 +287,36 @@ class MainWindow(QMainWindow):
 
     def _update_audio_status_labels(self) -> None:
         """Actualiza las etiquetas que muestran el estado de captura de audio."""
-        mic_active = self.config.get('record_audio_mic', False)
+        if self.recorder is None:
+            return  # Aún se están detectando los dispositivos
+        mic_active = bool(self.config.get('record_audio_mic', False))
         mic_device = self.recorder.mic_dev_name # Nombre ya resuelto (config o default)
-        mic_text = f"Micrófono: {'ACT' if mic_active else 'OFF'} ({mic_device or 'No encontrado/Default'})"
-        self.mic_status_label.setText(mic_text)
+        _set_text(self.mic_status_label,
+                  _MIC_TEMPLATES[mic_active].format(mic_device or _NO_DEVICE_TEXT))
 
-        loop_active = self.config.get('record_audio_loopback', False)
+        loop_active = bool(self.config.get('record_audio_loopback', False))
         loop_device = self.recorder.loopback_dev_name # Nombre ya resuelto
-        loop_text = f"Audio Sistema: {'ACT' if loop_active else 'OFF'} ({loop_device or 'No encontrado/Default'})"
         # Añadir nota si loopback no encontrado pero activado
-        if loop_active and not loop_device:
-            loop_text += " (Revisa si 'Stereo Mix' está habilitado)"
-        self.loopback_status_label.setText(loop_text)
+        loop_template = (_LOOP_MISSING_TEMPLATE if loop_active and not loop_device
+                         else _LOOP_TEMPLATES[loop_active])
+        _set_text(self.loopback_status_label, loop_template.format(loop_device or _NO_DEVICE_TEXT))
+
 
+    @property
+    def output_dir(self) -> str | None:
+        return self._output_dir
+
+    @output_dir.setter
+    def output_dir(self, value: str | None) -> None:
+        # El texto de la etiqueta depende solo de la carpeta: se calcula al cambiarla
+        self._output_dir = value
+        self._outdir_valid_cache = None
+        path_to_display = value if value and self._is_output_dir_valid() else None
+        self._output_dir_label_text = f"Guardar en: {path_to_display or 'No seleccionada / Inválida'}"
 
     def _get_output_dir_display_text(self) -> str:
-        """Genera el texto para mostrar la carpeta de salida."""
-        path_to_display = self.output_dir
-        if path_to_display and not os.path.isdir(path_to_display):
-             path_to_display = None
-        return f"Guardar en: {path_to_display or 'No seleccionada / Inválida'}"
+        """Devuelve el texto para mostrar la carpeta de salida."""
+        return self._output_dir_label_text
 
 
     def _set_state(self, new_state: State) -> None:
@@ -170,25 +326,32 @@ class MainWindow(QMainWindow):
             else: return
 
         self._state = new_state
-        print(f"Cambiando al estado: {new_state.name}")
+        logger.debug("Cambiando al estado: %s", new_state.name)
 
         is_idle = self._state == State.IDLE
         is_recording = self._state == State.RECORDING
 
-        self.status_label.setText(f"Estado: {new_state.name.replace('_', ' ').capitalize()}")
-        if is_idle:
-            self.timer_label.setText("00:00:00")
-
-        self.record_button.setEnabled(is_idle and self.ffmpeg_ok)
-        self.record_button.setText("Grabar")
-        self.pause_button.setEnabled(False) # Siempre deshabilitado
-        self.stop_button.setEnabled(is_recording and self.ffmpeg_ok)
-        self.output_dir_button.setEnabled(is_idle)
-        
-        # El botón de captura de pantalla siempre está disponible si FFmpeg está listo
-        self.screenshot_button.setEnabled(self.ffmpeg_ok)
-        
-        self._update_audio_status_labels() # Actualizar estado audio en cada cambio
+        # Aplicar todos los cambios con el repintado suspendido: la ventana se
+        # repinta una sola vez al final en lugar de tras cada widget
+        self.setUpdatesEnabled(False)
+        try:
+            _set_text(self.status_label, f"Estado: {new_state.name.replace('_', ' ').capitalize()}")
+            if is_idle:
+                self._last_time_str = "00:00:00"
+                _set_text(self.timer_label, self._last_time_str)
+
+            _set_enabled(self.record_button, is_idle and self.ffmpeg_ok and not self._taking_screenshot)
+            _set_text(self.record_button, "Grabar")
+            _set_enabled(self.pause_button, False) # Siempre deshabilitado
+            _set_enabled(self.stop_button, is_recording and self.ffmpeg_ok)
+            _set_enabled(self.output_dir_button, is_idle and not self._taking_screenshot)
+            _set_enabled(self.refresh_devices_button, is_idle and not self._refreshing_devices)
+            
+            # La captura de pantalla está disponible si FFmpeg está listo y no
+            # hay otra captura en curso
+            _set_enabled(self.screenshot_button, self.ffmpeg_ok and not self._taking_screenshot)
+        finally:
+            self.setUpdatesEnabled(True)
 
 
     # --- Slots (Manejadores de Eventos) ---
@@ -202,23 +365,32 @@ class MainWindow(QMainWindow):
     @Slot()
     def _on_record_clicked(self) -> None:
         """Slot para manejar el clic en el botón Grabar."""
-        if not self.ffmpeg_ok: return # Salir si FFmpeg no está listo
+        if not self.ffmpeg_ok or self._taking_screenshot: return # FFmpeg no listo o capturando
 
         if self._state == State.IDLE:
-            if not self.output_dir or not os.path.isdir(self.output_dir):
+            if not self._is_output_dir_valid():
                 if not self._select_output_dir(): return
 
             try:
-                now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-                filename = f"recording_{now}.mp4" # Asumir mp4 por ahora
+                # Nombre según la plantilla strftime de la config (compilada una vez)
+                make_filename = config_manager.compile_filename_template(
+                    self.config.get("filename_template", config_manager.DEFAULT_FILENAME_TEMPLATE)
+                )
+                filename = make_filename(datetime.now())
                 full_output_path = os.path.join(self.output_dir, filename)
             except Exception as e:
                 QMessageBox.warning(self,"Error de Archivo",f"No se pudo generar ruta:\n{e}")
                 return
 
-            print(f"Intentando iniciar grabación en: {full_output_path}")
-            if self.recorder.start(full_output_path):
-                self.elapsed_seconds = 0
+            logger.info("Intentando iniciar grabación en: %s", full_output_path)
+            if self.config.get("save_thumbnail", False):
+                # Miniatura junto al video, escrita por el mismo proceso FFmpeg
+                thumb_path = os.path.splitext(full_output_path)[0] + ".png"
+                started = self.recorder.start_with_thumbnail(full_output_path, thumb_path)
+            else:
+                started = self.recorder.start(full_output_path)
+            if started:
+                self._record_start = time.monotonic()
                 self._update_timer_display()
                 self.record_timer.start()
                 self._set_state(State.RECORDING)
@@ -229,229 +401,304 @@ class MainWindow(QMainWindow):
     @Slot()
     def _on_pause_clicked(self) -> None:
         """Slot para Pausa (Deshabilitado)."""
-        print("El botón Pausa está deshabilitado.")
+        logger.debug("El botón Pausa está deshabilitado.")
 
     @Slot()
     def _on_stop_clicked(self) -> None:
         """Slot para manejar el clic en el botón Detener."""
         if self._state == State.RECORDING: # Solo detener si está grabando
-            print("Acción: Deteniendo grabación...")
+            logger.info("Deteniendo grabación...")
             self.record_timer.stop()
             stop_result = self.recorder.stop()
             self._set_state(State.IDLE) # Volver a IDLE
             if stop_result:
-                print(f"Grabación detenida. Archivo: {stop_result}")
+                logger.info("Grabación detenida. Archivo: %s", stop_result)
                 QMessageBox.information(self, "Grabación Finalizada", f"Archivo guardado (o debería):\n{stop_result}")
             else:
-                print("El recorder indicó un problema al detener.")
+                logger.warning("El recorder indicó un problema al detener.")
                 QMessageBox.warning(self, "Error al Detener", "Hubo un problema al detener la grabación.")
 
 
     @Slot()
     def _update_timer_display(self) -> None:
-        """Actualiza la etiqueta del temporizador cada segundo."""
-        self.elapsed_seconds += 1
-        td = timedelta(seconds=self.elapsed_seconds)
-        total_seconds = int(td.total_seconds())
-        hours, remainder = divmod(total_seconds, 3600)
+        """Actualiza la etiqueta del temporizador (solo repinta al cambiar el segundo)."""
+        elapsed = int(time.monotonic() - self._record_start)
+        hours, remainder = divmod(elapsed, 3600)
         minutes, seconds = divmod(remainder, 60)
         time_str = f"{hours:02}:{minutes:02}:{seconds:02}"
+        # Repintar la etiqueta solo si el texto cambió
+        if time_str == self._last_time_str:
+            return
+        self._last_time_str = time_str
         self.timer_label.setText(time_str)
 
+    @Slot(object)
+    def _on_recording_ended_unexpectedly(self, _output_path: str | None = None) -> None:
+        """FFmpeg terminó sin que el usuario pulsara Detener (señal del Recorder)."""
+        if self._state != State.RECORDING:
+            return  # La grabación ya se detuvo por otra vía
+        logger.error("FFmpeg terminó inesperadamente durante la grabación.")
+        self.record_timer.stop()
+        stop_result = self.recorder.stop()  # Recoge el final de stderr y limpia el estado
+        self._set_state(State.IDLE)
+        QMessageBox.warning(
+            self, "Grabación Interrumpida",
+            "FFmpeg terminó inesperadamente.\nRevisa la consola para más detalles."
+            + (f"\n\nArchivo parcial:\n{stop_result}" if stop_result else "")
+        )
+
+    def _is_output_dir_valid(self) -> bool:
+        """Indica si la carpeta de salida existe (resultado válido OUTPUT_DIR_CHECK_TTL s)."""
+        path = self.output_dir
+        if not path:
+            return False
+        now = time.monotonic()
+        cached = self._outdir_valid_cache
+        if cached is not None and cached[0] == path and now - cached[1] < OUTPUT_DIR_CHECK_TTL:
+            return cached[2]
+        valid = os.path.isdir(path)
+        self._outdir_valid_cache = (path, now, valid)
+        return valid
+
+    @Slot()
+    def _save_config(self) -> None:
+        """Escribe la configuración en disco (llamado por el temporizador de guardado)."""
+        if not config_manager.save_config(self.config):
+            QMessageBox.warning(self, "Error de Configuración", "No se pudo guardar la configuración.")
+
+    def closeEvent(self, event) -> None:
+        """Guarda la configuración pendiente antes de cerrar la ventana."""
+        if self._config_save_timer.isActive():
+            self._config_save_timer.stop()
+            self._save_config()
+        super().closeEvent(event)
+
+    def _get_dir_dialog(self) -> QFileDialog:
+        """Diálogo de selección de carpeta (se crea una sola vez).
+
+        Se usa el diálogo de Qt y no el nativo: el nativo se reconstruye en cada
+        apertura (en Windows inicializa los objetos COM del shell cada vez).
+        """
+        if self._dir_dialog is None:
+            dialog = QFileDialog(self, "Seleccionar Carpeta de Salida")
+            dialog.setFileMode(QFileDialog.Directory)
+            dialog.setOption(QFileDialog.ShowDirsOnly, True)
+            dialog.setOption(QFileDialog.DontUseNativeDialog, True)
+            self._dir_dialog = dialog
+        return self._dir_dialog
+
     @Slot()
     def _select_output_dir(self) -> bool:
         """Abre diálogo para seleccionar carpeta y guarda la config."""
-        start_dir = self.output_dir if self.output_dir and os.path.isdir(self.output_dir) else os.path.expanduser("~")
-        selected_dir = QFileDialog.getExistingDirectory(self, "Seleccionar Carpeta de Salida", start_dir)
+        start_dir = self.output_dir if self._is_output_dir_valid() else os.path.expanduser("~")
+        dialog = self._get_dir_dialog()
+        dialog.setDirectory(start_dir)
+        selected_dir = ""
+        if dialog.exec():
+            selected = dialog.selectedFiles()
+            selected_dir = selected[0] if selected else ""
         if selected_dir:
             self.output_dir = selected_dir
-            print(f"Carpeta de salida seleccionada: {self.output_dir}")
+            logger.info("Carpeta de salida seleccionada: %s", self.output_dir)
             self.output_dir_label.setText(self._get_output_dir_display_text())
             self.config["output_dir"] = self.output_dir
-            if not config_manager.save_config(self.config):
-                QMessageBox.warning(self,"Error de Configuración","No se pudo guardar la carpeta seleccionada.")
+            self._config_save_timer.start()  # Guardado diferido (ver _save_config)
             return True
         else:
-            print("Selección de carpeta cancelada.")
+            logger.debug("Selección de carpeta cancelada.")
             return False
 
+    @Slot()
+    def _on_refresh_devices_clicked(self) -> None:
+        """Lanza la enumeración de dispositivos de audio en segundo plano."""
+        if self._refreshing_devices or self._state != State.IDLE:
+            return
+        self._refreshing_devices = True
+        self.refresh_devices_button.setEnabled(False)
+        self.mic_status_label.setText("Mic: Buscando dispositivos...")
+        self.loopback_status_label.setText("Sistema: Buscando dispositivos...")
+
+        worker = DeviceRefreshWorker()
+        worker.signals.finished.connect(self._on_devices_refreshed)
+        worker.signals.error.connect(self._on_devices_refresh_error)
+        QThreadPool.globalInstance().start(worker)
+
+    @Slot(object)
+    def _on_devices_refreshed(self, devices: dict) -> None:
+        """Recibe la nueva enumeración (en el hilo de la GUI) y actualiza el Recorder."""
+        self._refreshing_devices = False
+        self.audio_devices = devices
+        if self.recorder is not None:  # None si falló la creación del Recorder
+            self.recorder.refresh_audio_devices()
+        self._update_audio_status_labels() # Los nombres resueltos pueden haber cambiado
+        logger.info("Dispositivos de audio: %d entradas, %d salidas", len(devices['input']), len(devices['output']))
+        self._set_state(self._state)
+
+    @Slot(str)
+    def _on_devices_refresh_error(self, message: str) -> None:
+        """Informa de un error al enumerar dispositivos."""
+        self._refreshing_devices = False
+        logger.error("Error al actualizar dispositivos de audio: %s", message)
+        self._set_state(self._state)
+        QMessageBox.warning(self, "Error de Audio", f"No se pudieron detectar los dispositivos:\n{message}")
+
     @Slot()
     def _show_audio_help(self) -> None:
         """Muestra un diálogo de ayuda con instrucciones para configurar el audio del sistema."""
-        import platform
-        
-        title = "Configuración de Audio del Sistema"
-        system = platform.system().lower()
-        
-        if system == "linux":
-            message = (
-                "<h3>Cómo habilitar la captura de audio del sistema en Linux</h3>"
-                "<p><b>Para sistemas con PulseAudio (la mayoría de distribuciones):</b></p>"
-                "<ol>"
-                "<li>Instala pavucontrol si no lo tienes:<br>"
-                "<code>sudo apt install pavucontrol</code></li>"
-                "<li>Abre Control de Volumen de PulseAudio (pavucontrol)</li>"
-                "<li>Ve a la pestaña <b>Dispositivos de entrada</b></li>"
-                "<li>Cambia el selector 'Mostrar:' a <b>Todos los dispositivos de entrada</b></li>"
-                "<li>Deberías ver uno o más dispositivos llamados 'Monitor of...'</li>"
-                "<li>Asegúrate de que no estén silenciados (icono de altavoz tachado)</li>"
-                "</ol>"
-                "<p><b>Después de seguir estos pasos:</b></p>"
-                "<ol>"
-                "<li>Reinicia esta aplicación</li>"
-                "<li>El dispositivo 'Monitor of...' debería aparecer automáticamente</li>"
-                "</ol>"
-                "<p><b>Nota:</b> Para grabar audio del sistema mientras se reproduce, debes asegurarte de estar usando el dispositivo de salida cuyo 'Monitor' quieres capturar.</p>"
-            )
-        elif system == "windows":
-            message = (
-                "<h3>Cómo habilitar Stereo Mix en Windows</h3>"
-                "<p>Para capturar el audio del sistema en Windows, necesitas habilitar 'Stereo Mix':</p>"
-                "<ol>"
-                "<li>Haz clic derecho en el icono de volumen en la barra de tareas</li>"
-                "<li>Selecciona 'Sonidos' o 'Configuración de sonido'</li>"
-                "<li>Ve a la pestaña 'Grabación'</li>"
-                "<li>Haz clic derecho en un área vacía y marca 'Mostrar dispositivos deshabilitados'</li>"
-                "<li>Debería aparecer 'Stereo Mix' (o un nombre similar como 'Lo que escuchas', 'What U Hear', etc.)</li>"
-                "<li>Haz clic derecho en 'Stereo Mix' y selecciona 'Habilitar'</li>"
-                "<li>Haz clic derecho de nuevo y selecciona 'Establecer como dispositivo predeterminado'</li>"
-                "</ol>"
-                "<p><b>Si no ves Stereo Mix:</b></p>"
-                "<ul>"
-                "<li>Tu tarjeta de sonido podría no soportarlo</li>"
-                "<li>Prueba actualizar los controladores de audio</li>"
-                "<li>Como alternativa, puedes usar software como 'Voicemeeter' o 'Virtual Audio Cable'</li>"
-                "</ul>"
-                "<p><b>Después de seguir estos pasos:</b></p>"
-                "<ol>"
-                "<li>Reinicia esta aplicación</li>"
-                "<li>El dispositivo 'Stereo Mix' debería aparecer automáticamente</li>"
-                "</ol>"
-            )
-        else:  # macOS u otros
-            message = (
-                "<h3>Configuración de Audio del Sistema</h3>"
-                "<p>Tu sistema operativo necesita pasos especiales para capturar el audio del sistema:</p>"
-                "<ul>"
-                "<li>En macOS, necesitas instalar software adicional como 'Soundflower', 'BlackHole', 'Loopback', etc.</li>"
-                "<li>En otros sistemas, busca herramientas específicas que permitan capturar el audio del sistema</li>"
-                "</ul>"
-                "<p>Consulta la documentación en línea para tu sistema operativo específico.</p>"
-            )
-        
-        # Mostrar un diálogo con instrucciones detalladas
-        msg_box = QMessageBox(self)
-        msg_box.setWindowTitle(title)
-        msg_box.setText(message)
-        msg_box.setTextFormat(1)  # Qt.RichText
-        msg_box.setIcon(QMessageBox.Information)
-        msg_box.setStandardButtons(QMessageBox.Ok)
-        msg_box.exec()
+        # Mostrar un diálogo con instrucciones detalladas (se crea una sola vez)
+        if self._audio_help_box is None:
+            msg_box = QMessageBox(self)
+            msg_box.setWindowTitle(_AUDIO_HELP_TITLE)
+            # Formato fijado antes del texto: Qt no tiene que adivinar si es HTML
+            msg_box.setTextFormat(Qt.TextFormat.RichText)
+            msg_box.setText(_AUDIO_HELP_HTML)
+            msg_box.setIcon(QMessageBox.Information)
+            msg_box.setStandardButtons(QMessageBox.Ok)
+            self._audio_help_box = msg_box
+        self._audio_help_box.exec()
+
+    def _get_shot_type_box(self) -> QMessageBox:
+        """Diálogo para elegir el tipo de captura (se crea una sola vez)."""
+        if self._shot_type_box is None:
+            msg_box = QMessageBox(self)
+            msg_box.setWindowTitle("Tipo de Captura")
+            msg_box.setText("¿Qué tipo de captura deseas realizar?")
+            self._shot_area_btn = msg_box.addButton("Seleccionar Área", QMessageBox.ActionRole)
+            self._shot_full_btn = msg_box.addButton("Pantalla Completa", QMessageBox.ActionRole)
+            msg_box.addButton("Cancelar", QMessageBox.RejectRole)
+            self._shot_type_box = msg_box
+        return self._shot_type_box
+
+    def _get_shot_result_box(self) -> QMessageBox:
+        """Diálogo con el resultado de la captura (se crea una sola vez)."""
+        if self._shot_result_box is None:
+            msg_box = QMessageBox(self)
+            msg_box.setWindowTitle("Captura Realizada")
+            msg_box.setIcon(QMessageBox.Information)
+            # Botones: Abrir imagen, Abrir carpeta, Cerrar
+            self._shot_open_btn = msg_box.addButton("Abrir Imagen", QMessageBox.ActionRole)
+            self._shot_folder_btn = msg_box.addButton("Abrir Carpeta", QMessageBox.ActionRole)
+            msg_box.addButton(QMessageBox.Close)
+            self._shot_result_box = msg_box
+        return self._shot_result_box
 
     @Slot()
     def _on_screenshot_clicked(self) -> None:
         """Slot para manejar el clic en el botón de captura de pantalla."""
+        if self._taking_screenshot:
+            return
         if not self.ffmpeg_ok:
             QMessageBox.warning(self, "Error", "FFmpeg no está disponible para capturar pantalla.")
             return
             
         # Verificar que tenemos una carpeta de salida
-        if not self.output_dir or not os.path.isdir(self.output_dir):
+        if not self._is_output_dir_valid():
             if not self._select_output_dir():
                 return
         
         try:
             # Preguntar al usuario si quiere capturar toda la pantalla o un área
-            msg_box = QMessageBox(self)
-            msg_box.setWindowTitle("Tipo de Captura")
-            msg_box.setText("¿Qué tipo de captura deseas realizar?")
-            area_btn = msg_box.addButton("Seleccionar Área", QMessageBox.ActionRole)
-            completa_btn = msg_box.addButton("Pantalla Completa", QMessageBox.ActionRole)
-            cancelar_btn = msg_box.addButton("Cancelar", QMessageBox.RejectRole)
-            
+            msg_box = self._get_shot_type_box()
             msg_box.exec()
             
-            # Si el usuario canceló, salir
-            if msg_box.clickedButton() == cancelar_btn:
+            # Si el usuario canceló (botón o ESC), salir
+            clicked = msg_box.clickedButton()
+            if clicked not in (self._shot_area_btn, self._shot_full_btn):
                 return
                 
             # Determinar si se seleccionará un área
-            select_area = (msg_box.clickedButton() == area_btn)
+            select_area = (clicked == self._shot_area_btn)
                 
             # Generar nombre de archivo con timestamp para la captura
             now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
             filename = f"captura_{now}.png"  # Usar formato PNG por defecto
             full_output_path = os.path.join(self.output_dir, filename)
             
+            # La captura espera en un bucle de eventos anidado: deshabilitar los
+            # botones que podrían volver a entrar hasta que termine
+            self._set_taking_screenshot(True)
+            
             # Actualizar estado temporalmente
             prev_text = self.status_label.text()
             area_text = "seleccionada " if select_area else ""
             self.status_label.setText(f"Estado: Capturando área {area_text}...")
-            self.repaint()  # Forzar actualización inmediata
+            self.status_label.repaint()  # Forzar actualización inmediata (solo la etiqueta)
             
-            # Si se va a seleccionar un área, minimizar la ventana para no interferir
+            # Si se va a seleccionar un área, ocultar la ventana para no interferir
+            # (sin la animación de minimizar/restaurar del gestor de ventanas).
+            # La captura continúa desde un temporizador: el bucle de eventos sigue
+            # atendiendo la ocultación y el repintado mientras tanto
             if select_area:
-                self.showMinimized()
-                # Pequeña pausa para permitir que la ventana se minimice completamente
-                QApplication.processEvents()
-                import time
-                time.sleep(0.5)
-            
+                self.hide()
+                QTimer.singleShot(
+                    HIDE_DELAY_MS,
+                    lambda: self._do_screenshot(full_output_path, select_area, prev_text)
+                )
+            else:
+                self._do_screenshot(full_output_path, select_area, prev_text)
+        except Exception as e:
+            self._set_taking_screenshot(False)
+            logger.error("Error al capturar pantalla: %s", e)
+            QMessageBox.warning(self, "Error", f"Error al capturar pantalla:\n{e}")
+
+    def _set_taking_screenshot(self, busy: bool) -> None:
+        """Marca si hay una captura en curso y actualiza los botones afectados."""
+        self._taking_screenshot = busy
+        self._set_state(self._state)
+
+    def _do_screenshot(self, full_output_path: str, select_area: bool, prev_text: str) -> None:
+        """Toma la captura, restaura la ventana y muestra el resultado."""
+        area_text = "seleccionada " if select_area else ""
+        error = None
+        try:
             # Tomar la captura
             screenshot_path = self.recorder.take_screenshot(full_output_path, select_area)
+        except Exception as e:
+            screenshot_path, error = None, e
+        finally:
+            self._set_taking_screenshot(False)
+
+        # Restaurar ventana y estado
+        if select_area:
+            self.show()
+            self.raise_()
+            self.activateWindow()
+        self.status_label.setText(prev_text)
+
+        if error is not None:
+            logger.error("Error al capturar pantalla: %s", error)
+            QMessageBox.warning(self, "Error", f"Error al capturar pantalla:\n{error}")
+            return
+
+        if screenshot_path:
+            logger.info("Captura de pantalla %sguardada en: %s", area_text, screenshot_path)
             
-            # Restaurar ventana
-            if select_area:
-                self.showNormal()
-                
-            # Restaurar estado
-            self.status_label.setText(prev_text)
+            # Mostrar mensaje con opción para abrir la imagen
+            msg_box = self._get_shot_result_box()
+            msg_box.setText(f"Captura {area_text}guardada en:\n{screenshot_path}")
+            msg_box.exec()
             
-            if screenshot_path:
-                print(f"Captura de pantalla {area_text}guardada en: {screenshot_path}")
-                
-                # Mostrar mensaje con opción para abrir la imagen
-                msg_box = QMessageBox(self)
-                msg_box.setWindowTitle("Captura Realizada")
-                msg_box.setText(f"Captura {area_text}guardada en:\n{screenshot_path}")
-                msg_box.setIcon(QMessageBox.Information)
-                
-                # Botones: Abrir imagen, Abrir carpeta, Cerrar
-                abrir_btn = msg_box.addButton("Abrir Imagen", QMessageBox.ActionRole)
-                carpeta_btn = msg_box.addButton("Abrir Carpeta", QMessageBox.ActionRole)
-                msg_box.addButton(QMessageBox.Close)
-                
-                msg_box.exec()
-                
-                # Manejar clic en botones
-                if msg_box.clickedButton() == abrir_btn:
-                    self._open_file(screenshot_path)
-                elif msg_box.clickedButton() == carpeta_btn:
-                    self._open_directory(os.path.dirname(screenshot_path))
-            else:
-                if select_area:
-                    QMessageBox.information(self, "Captura Cancelada", "Has cancelado la selección del área.")
-                else:
-                    QMessageBox.warning(self, "Error", "No se pudo capturar la pantalla. Revisa la consola para más detalles.")
-        except Exception as e:
-            print(f"Error al capturar pantalla: {e}")
-            QMessageBox.warning(self, "Error", f"Error al capturar pantalla:\n{e}")
+            # Manejar clic en botones
+            if msg_box.clickedButton() == self._shot_open_btn:
+                self._open_file(screenshot_path)
+            elif msg_box.clickedButton() == self._shot_folder_btn:
+                self._open_directory(os.path.dirname(screenshot_path))
+        elif select_area:
+            QMessageBox.information(self, "Captura Cancelada", "Has cancelado la selección del área.")
+        else:
+            QMessageBox.warning(self, "Error", "No se pudo capturar la pantalla. Revisa la consola para más detalles.")
             
     def _open_file(self, path: str) -> None:
         """Abre un archivo con la aplicación predeterminada del sistema."""
         try:
-            import subprocess
-            import platform
-            
-            system = platform.system().lower()
-            if system == 'windows':
+            if _SYSTEM == 'windows':
                 os.startfile(path)
-            elif system == 'darwin':  # macOS
+            elif _SYSTEM == 'darwin':  # macOS
                 subprocess.run(['open', path], check=True)
             else:  # Linux o otros
                 subprocess.run(['xdg-open', path], check=True)
         except Exception as e:
-            print(f"Error al abrir archivo: {e}")
+            logger.error("Error al abrir archivo: %s", e)
             
     def _open_directory(self, path: str) -> None:
         """Abre un directorio con el explorador de archivos del sistema."""
@@ -0,0 +1,61 @@
+# src/screen_recorder/gui/workers.py
+
+"""
+Tareas en segundo plano para la GUI.
+
+Las operaciones bloqueantes (como crear el Recorder o enumerar dispositivos
+con PortAudio) se ejecutan en el QThreadPool global para no congelar el hilo de la interfaz.
+Los resultados vuelven al hilo principal mediante señales.
+"""
+
+from PySide6.QtCore import QObject, QRunnable, Signal, Slot
+
+from screen_recorder.core import audio_utils
+from screen_recorder.core.recorder import Recorder
+
+
+class WorkerSignals(QObject):
+    """Señales emitidas por los workers (QRunnable no hereda de QObject)."""
+    finished = Signal(object)
+    error = Signal(str)
+
+
+class DeviceRefreshWorker(QRunnable):
+    """Vuelve a enumerar los dispositivos de audio fuera del hilo de la GUI."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.signals = WorkerSignals()
+
+    @Slot()
+    def run(self) -> None:
+        try:
+            # Reiniciar PortAudio para detectar dispositivos conectados después del arranque
+            audio_utils.invalidate_audio_cache(reinitialize=True)
+            devices = audio_utils.list_audio_devices()
+        except Exception as e:
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.finished.emit(devices)
+
+
+class RecorderInitWorker(QRunnable):
+    """Crea el Recorder (búsqueda de FFmpeg, dispositivos y códec) fuera del hilo de la GUI."""
+
+    def __init__(self, config: dict) -> None:
+        super().__init__()
+        self.config = config
+        self.signals = WorkerSignals()
+
+    @Slot()
+    def run(self) -> None:
+        try:
+            recorder = Recorder(self.config)
+            if recorder.ffmpeg_ready:
+                # Elige el códec ('auto' lanza codificaciones de prueba) y precalcula
+                # el comando aquí, para que el primer clic en Grabar no bloquee la GUI
+                recorder._build_static_cmd_prefix()
+        except Exception as e:
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.finished.emit(recorder)
@@ -1,17 +1,39 @@
 # src/screen_recorder/main.py
 
+import os
 import sys
+import logging
+import logging.handlers
+from queue import SimpleQueue
 from PySide6.QtWidgets import QApplication
 
 # Importamos la ventana principal desde nuestro módulo gui
 # Usamos import relativo porque main.py está dentro del paquete screen_recorder
 from .gui import MainWindow
+from .core.config_manager import flush_config
 # from . import __version__ # Podríamos importar la versión si la necesitáramos aquí
 
 def run_app() -> None:
     """
     Inicializa y ejecuta la aplicación Qt.
     """
+    # El núcleo y la GUI usan logging ('screen_recorder.*'); el nivel DEBUG
+    # (p. ej. el comando completo de FFmpeg) se activa con SCREEN_RECORDER_DEBUG=1
+    debug = os.environ.get("SCREEN_RECORDER_DEBUG") == "1"
+    # Los registros se encolan y un hilo aparte los escribe: un terminal lento
+    # o un pipe lleno no bloquean la GUI ni el arranque de una grabación
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(
+        "%(asctime)s [%(levelname)s] %(name)s: %(message)s", datefmt="%H:%M:%S"
+    ))
+    log_queue = SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, console)
+    logging.basicConfig(
+        level=logging.DEBUG if debug else logging.INFO,
+        handlers=[logging.handlers.QueueHandler(log_queue)],
+    )
+    listener.start()
+
     # Crear la instancia de la aplicación Qt
     # sys.argv permite pasar argumentos de línea de comandos a Qt, si es necesario.
     app = QApplication(sys.argv)
@@ -22,7 +44,12 @@ def run_app() -> None:
 
     # Iniciar el bucle de eventos de la aplicación.
     # sys.exit() asegura que el código de salida de la aplicación se devuelva correctamente.
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    # Guardar los cambios diferidos antes de parar el listener, para que sus
+    # registros también se escriban (el atexit de config_manager ya no tendrá nada)
+    flush_config()
+    listener.stop()  # Vacía la cola de registros pendientes
+    sys.exit(exit_code)
 
 # --- Bloque de ejecución principal ---
 # Este bloque se ejecuta cuando el script es llamado directamente
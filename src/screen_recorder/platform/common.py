@@ -8,8 +8,46 @@ Este módulo contiene código que es independiente del sistema operativo.
 
 import sys
 import platform
+from functools import lru_cache
 from typing import Dict, Any, Optional, List, Tuple
 
+# El sistema operativo no cambia durante la ejecución: se consulta una vez
+_SYSTEM = platform.system()
+
+
+@lru_cache(maxsize=1)
+def _system_info() -> dict[str, str]:
+    """Recopila la información del sistema (una sola vez por proceso)."""
+    info = {
+        "system": _SYSTEM,
+        "release": platform.release(),
+        "version": platform.version(),
+        "architecture": platform.machine(),
+        "python_version": platform.python_version(),
+        "python_implementation": platform.python_implementation(),
+    }
+    
+    # Información específica por plataforma
+    if _SYSTEM == "Windows":
+        info["win_edition"] = platform.win32_edition() if hasattr(platform, "win32_edition") else "Unknown"
+    elif _SYSTEM == "Darwin":  # macOS
+        info["mac_ver"] = ".".join(platform.mac_ver()[0].split(".")[:2])
+    elif _SYSTEM == "Linux":
+        try:
+            import distro
+            info["distro"] = distro.name(pretty=True)
+        except ImportError:
+            try:
+                with open("/etc/os-release") as f:
+                    for line in f:
+                        if line.startswith("PRETTY_NAME="):
+                            info["distro"] = line.split("=")[1].strip().strip('"')
+                            break
+            except (FileNotFoundError, IOError):
+                info["distro"] = "Unknown Linux Distribution"
+    
+    return info
+
 class PlatformInfo:
     """Clase para obtener información sobre la plataforma actual."""
     
@@ -19,52 +57,25 @@ class PlatformInfo:
         Obtiene información básica sobre el sistema.
         
         Returns:
-            Dict[str, str]: Diccionario con información del sistema.
+            Dict[str, str]: Diccionario con información del sistema (copia
+            de la calculada en la primera llamada).
         """
-        info = {
-            "system": platform.system(),
-            "release": platform.release(),
-            "version": platform.version(),
-            "architecture": platform.machine(),
-            "python_version": platform.python_version(),
-            "python_implementation": platform.python_implementation(),
-        }
-        
-        # Información específica por plataforma
-        if platform.system() == "Windows":
-            info["win_edition"] = platform.win32_edition() if hasattr(platform, "win32_edition") else "Unknown"
-        elif platform.system() == "Darwin":  # macOS
-            info["mac_ver"] = ".".join(platform.mac_ver()[0].split(".")[:2])
-        elif platform.system() == "Linux":
-            try:
-                import distro
-                info["distro"] = distro.name(pretty=True)
-            except ImportError:
-                try:
-                    with open("/etc/os-release") as f:
-                        for line in f:
-                            if line.startswith("PRETTY_NAME="):
-                                info["distro"] = line.split("=")[1].strip().strip('"')
-                                break
-                except (FileNotFoundError, IOError):
-                    info["distro"] = "Unknown Linux Distribution"
-        
-        return info
+        return dict(_system_info())
     
     @staticmethod
     def is_windows() -> bool:
         """Comprueba si el sistema es Windows."""
-        return platform.system() == "Windows"
+        return _SYSTEM == "Windows"
     
     @staticmethod
     def is_macos() -> bool:
         """Comprueba si el sistema es macOS."""
-        return platform.system() == "Darwin"
+        return _SYSTEM == "Darwin"
     
     @staticmethod
     def is_linux() -> bool:
         """Comprueba si el sistema es Linux."""
-        return platform.system() == "Linux"
+        return _SYSTEM == "Linux"
     
     @staticmethod
     def get_screen_size() -> Tuple[int, int]:
@@ -100,7 +111,7 @@ def get_platform_module():
     Returns:
         module: Módulo específico para la plataforma actual.
     """
-    system = platform.system().lower()
+    system = _SYSTEM.lower()
     
     if system == "windows":
         from . import windows
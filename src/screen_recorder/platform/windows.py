@@ -13,6 +13,8 @@ import platform
 import winreg
 from typing import List, Dict, Optional, Any, Tuple
 
+from ..core.audio_utils import LOOPBACK_KEYWORDS
+
 def get_ffmpeg_command_args(config: Dict[str, Any], output_filename: str) -> List[str]:
     """
     Genera argumentos de comando FFmpeg optimizados para Windows.
@@ -167,8 +169,7 @@ def get_audio_devices() -> Dict[str, List[Dict[str, Any]]]:
                     }
                     
                     # Detectar si es loopback ("Stereo Mix" u otros)
-                    loopback_keywords = ["stereo mix", "what u hear", "wave out", "mix", "loopback"]
-                    is_loopback = any(keyword in device_name.lower() for keyword in loopback_keywords)
+                    is_loopback = any(keyword in device_name.lower() for keyword in LOOPBACK_KEYWORDS)
                     
                     if is_loopback:
                         result["loopback"].append(device_info)
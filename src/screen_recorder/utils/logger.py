@@ -9,8 +9,8 @@ Proporciona funcionalidad de registro para las diferentes partes de la aplicaci
 import os
 import sys
 import logging
-import appdirs
 from datetime import datetime
+from functools import lru_cache
 from typing import Optional
 
 # Configuración básica
@@ -26,18 +26,25 @@ LOG_LEVELS = {
     "critical": logging.CRITICAL
 }
 
-# Ruta del archivo de log
-log_dir = appdirs.user_log_dir(APP_NAME, APP_AUTHOR)
-
-# Asegurar que el directorio de logs exista
-if not os.path.exists(log_dir):
-    try:
-        os.makedirs(log_dir)
-    except Exception as e:
-        print(f"Error al crear directorio de logs: {e}", file=sys.stderr)
-
-# Nombre del archivo basado en la fecha
-log_file = os.path.join(log_dir, f"{APP_NAME}_{datetime.now().strftime('%Y-%m-%d')}.log")
+@lru_cache(maxsize=1)
+def _get_log_file() -> str:
+    """
+    Calcula (una sola vez) la ruta del archivo de log y crea su directorio.
+    appdirs se importa aquí para no pagar su coste al importar el módulo.
+    """
+    import appdirs
+    
+    log_dir = appdirs.user_log_dir(APP_NAME, APP_AUTHOR)
+    
+    # Asegurar que el directorio de logs exista
+    if not os.path.exists(log_dir):
+        try:
+            os.makedirs(log_dir)
+        except Exception as e:
+            print(f"Error al crear directorio de logs: {e}", file=sys.stderr)
+    
+    # Nombre del archivo basado en la fecha
+    return os.path.join(log_dir, f"{APP_NAME}_{datetime.now().strftime('%Y-%m-%d')}.log")
 
 # Formato del log
 LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
@@ -54,15 +61,29 @@ console_formatter = logging.Formatter(LOG_FORMAT, DATE_FORMAT)
 console_handler.setFormatter(console_formatter)
 app_logger.addHandler(console_handler)
 
-# Handler para archivo
-try:
-    file_handler = logging.FileHandler(log_file)
-    file_handler.setLevel(logging.DEBUG)  # Guardar todos los niveles en el archivo
-    file_formatter = logging.Formatter(LOG_FORMAT, DATE_FORMAT)
-    file_handler.setFormatter(file_formatter)
-    app_logger.addHandler(file_handler)
-except Exception as e:
-    print(f"No se pudo configurar el archivo de log: {e}", file=sys.stderr)
+# Handler para archivo (se crea con el primer logger solicitado)
+file_handler: Optional[logging.FileHandler] = None
+
+def _ensure_file_handler() -> None:
+    """Añade el handler de archivo al logger principal la primera vez."""
+    global file_handler
+    if file_handler is not None:
+        return
+    
+    log_file = _get_log_file()
+    try:
+        file_handler = logging.FileHandler(log_file)
+        file_handler.setLevel(logging.DEBUG)  # Guardar todos los niveles en el archivo
+        file_formatter = logging.Formatter(LOG_FORMAT, DATE_FORMAT)
+        file_handler.setFormatter(file_formatter)
+        app_logger.addHandler(file_handler)
+    except Exception as e:
+        print(f"No se pudo configurar el archivo de log: {e}", file=sys.stderr)
+        return
+    
+    # Mensajes de inicialización
+    app_logger.info(f"===== Inicio de sesión: {APP_NAME} =====")
+    app_logger.info(f"Archivo de log: {log_file}")
 
 def get_logger(name: str) -> logging.Logger:
     """
@@ -74,6 +95,8 @@ def get_logger(name: str) -> logging.Logger:
     Returns:
         logging.Logger: Logger configurado para el componente.
     """
+    _ensure_file_handler()
+    
     # Prefijamos con el nombre de la aplicación
     if not name.startswith(APP_NAME):
         name = f"{APP_NAME}.{name}"
@@ -97,6 +120,7 @@ def set_level(level: str, handler_type: Optional[str] = None) -> None:
         app_logger.info(f"Nivel de log de consola cambiado a: {level.upper()}")
     
     if handler_type is None or handler_type == 'file':
+        _ensure_file_handler()
         for handler in app_logger.handlers:
             if isinstance(handler, logging.FileHandler):
                 handler.setLevel(log_level)
@@ -109,11 +133,7 @@ def get_log_file_path() -> str:
     Returns:
         str: Ruta al archivo de log.
     """
-    return log_file
-
-# Mensajes de inicialización
-app_logger.info(f"===== Inicio de sesión: {APP_NAME} =====")
-app_logger.info(f"Archivo de log: {log_file}")
+    return _get_log_file()
 
 if __name__ == "__main__":
     # Código de prueba para el sistema de logging
@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+import pytest
+
+from screen_recorder.core import audio_utils
+
+
+def _device(name, inputs=2):
+    return {'name': name, 'max_input_channels': inputs, 'max_output_channels': 0}
+
+
+@pytest.fixture
+def fake_devices(monkeypatch):
+    """Sustituye sounddevice por una lista de dispositivos fija."""
+    def install(devices, platform):
+        fake_sd = SimpleNamespace(query_devices=lambda: devices,
+                                  query_hostapis=lambda: ())
+        monkeypatch.setattr(audio_utils, '_sd', fake_sd)
+        monkeypatch.setattr(audio_utils.sys, 'platform', platform)
+        audio_utils.invalidate_audio_cache()
+    yield install
+    audio_utils.invalidate_audio_cache()
+
+
+def test_loopback_respeta_prioridad_de_palabras_clave(fake_devices):
+    """'Stereo Mix' gana aunque otro dispositivo con 'mix' aparezca antes."""
+    fake_devices([
+        _device('Microphone Mixer'),
+        _device('Loopback Audio'),
+        _device('Stereo Mix (Realtek Audio)'),
+    ], 'win32')
+    loopback = audio_utils.find_loopback_device_info()
+    assert loopback['name'] == 'Stereo Mix (Realtek Audio)'
+
+
+def test_loopback_ignora_dispositivos_sin_entrada(fake_devices):
+    """Un dispositivo sin canales de entrada no se elige como loopback."""
+    fake_devices([
+        _device('Stereo Mix', inputs=0),
+        _device('Wave Out Mix'),
+    ], 'win32')
+    assert audio_utils.find_loopback_device_info()['name'] == 'Wave Out Mix'
+
+
+def test_loopback_linux_busca_monitor(fake_devices):
+    """En Linux se elige la fuente 'Monitor of ...' de PulseAudio."""
+    fake_devices([
+        _device('Built-in Audio Analog Stereo'),
+        _device('Monitor of Built-in Audio Analog Stereo'),
+    ], 'linux')
+    assert audio_utils.find_loopback_device_info()['name'].startswith('Monitor of')
@@ -0,0 +1,25 @@
+from datetime import datetime
+
+import pytest
+
+from screen_recorder.core.config_manager import (
+    DEFAULT_FILENAME_TEMPLATE,
+    compile_filename_template,
+)
+
+FECHA = datetime(2024, 3, 9, 7, 5, 2)
+
+
+@pytest.mark.parametrize("template", [
+    DEFAULT_FILENAME_TEMPLATE,
+    "grabacion_%Y%m%d_%H%M%S.mp4",
+    "%Y-%m-%d/%H.%M.%S.mkv",
+    "sin_directivas.mp4",
+    "porcentaje_%%_%Y.mp4",
+    "llaves_{x}_%d}{.mp4",
+    "%a %b %j %p.mov",
+])
+def test_compile_filename_template_equivale_a_strftime(template):
+    """La plantilla compilada produce el mismo nombre que strftime."""
+    make_filename = compile_filename_template(template)
+    assert make_filename(FECHA) == FECHA.strftime(template)
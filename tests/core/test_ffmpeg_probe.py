@@ -0,0 +1,118 @@
+import os
+
+import pytest
+
+from screen_recorder.core import ffmpeg_probe
+from screen_recorder.core.ffmpeg_probe import (
+    FFmpegCapabilities,
+    _parse_encoders,
+    _parse_filters,
+    _parse_formats,
+)
+
+ENCODERS_OUTPUT = """\
+Encoders:
+ V..... = Video
+ A..... = Audio
+ S..... = Subtitle
+ .F.... = Frame-level multithreading
+ ------
+ V....D libx264              libx264 H.264 / AVC / MPEG-4 AVC (codec h264)
+ V....D h264_nvenc           NVIDIA NVENC H.264 encoder (codec h264)
+ A....D aac                  AAC (Advanced Audio Coding)
+ S..... ass                  ASS (Advanced SubStation Alpha) subtitle
+"""
+
+FORMATS_OUTPUT = """\
+File formats:
+ D. = Demuxing supported
+ .E = Muxing supported
+ --
+ D  x11grab         X11 screen capture, using XCB
+ DEd pulse          Pulse audio output
+  E mov,mp4,m4a,3gp,3g2,mj2 QuickTime / MOV
+ D  dshow           DirectShow capture
+"""
+
+FILTERS_OUTPUT = """\
+Filters:
+  T.. = Timeline support
+  ------
+ ... ddagrab           |->V       Grab Windows Desktop images using DXGI
+ ... pipewiregrab      |->V       Capture screen using PipeWire
+ T.C amix              N->A       Audio mixing.
+ ... hwdownload        V->V       Download a hardware frame to a normal frame
+"""
+
+
+def test_parse_encoders():
+    """Se extraen los nombres de codificador e ignoran la leyenda."""
+    encoders = _parse_encoders(ENCODERS_OUTPUT)
+    assert encoders == {"libx264", "h264_nvenc", "aac", "ass"}
+
+
+def test_parse_formats():
+    """La tabla empieza tras '--' y los alias separados por comas se expanden."""
+    formats = _parse_formats(FORMATS_OUTPUT)
+    assert {"x11grab", "pulse", "dshow", "mov", "mp4", "mj2"} <= formats
+    assert not formats & {"D.", ".E", "D", "DEd"}
+
+
+def test_parse_filters():
+    """Solo las líneas con columna de entradas/salidas ('->') son filtros."""
+    filters = _parse_filters(FILTERS_OUTPUT)
+    assert filters == {"ddagrab", "pipewiregrab", "amix", "hwdownload"}
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    """Binario falso y caché en un directorio temporal; cuenta las consultas."""
+    binary = tmp_path / "ffmpeg"
+    binary.write_bytes(b"")
+    cache_path = str(tmp_path / "caps.json")
+    monkeypatch.setattr(ffmpeg_probe, "_get_cache_path", lambda: cache_path)
+
+    calls = []
+    caps = FFmpegCapabilities(frozenset({"libx264"}), frozenset({"x11grab"}),
+                              frozenset({"amix"}))
+
+    def probe(path):
+        calls.append(path)
+        return caps
+
+    monkeypatch.setattr(ffmpeg_probe, "_probe_ffmpeg_caps", probe)
+    ffmpeg_probe.get_capabilities.cache_clear()
+    yield str(binary), calls, caps
+    ffmpeg_probe.get_capabilities.cache_clear()
+
+
+def test_cache_roundtrip(fake_ffmpeg):
+    """Lo guardado con _save_cached se recupera con el mismo binario y mtime."""
+    path, _calls, caps = fake_ffmpeg
+    mtime_ns = os.stat(path).st_mtime_ns
+    ffmpeg_probe._save_cached(path, mtime_ns, caps)
+
+    assert ffmpeg_probe._load_cached(path, mtime_ns) == caps
+    assert ffmpeg_probe._load_cached(path, mtime_ns + 1) is None
+    assert ffmpeg_probe._load_cached(path + "_otro", mtime_ns) is None
+
+
+def test_get_capabilities_usa_cache_de_disco(fake_ffmpeg):
+    """Mientras el mtime no cambie, FFmpeg solo se consulta una vez."""
+    path, calls, caps = fake_ffmpeg
+    assert ffmpeg_probe.get_capabilities(path) == caps
+    ffmpeg_probe.get_capabilities.cache_clear()  # Simula un nuevo proceso
+    assert ffmpeg_probe.get_capabilities(path) == caps
+    assert calls == [path]
+
+
+def test_get_capabilities_invalida_al_cambiar_mtime(fake_ffmpeg):
+    """Si el binario cambia (otro mtime), se vuelve a consultar a FFmpeg."""
+    path, calls, _caps = fake_ffmpeg
+    ffmpeg_probe.get_capabilities(path)
+
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    ffmpeg_probe.get_capabilities.cache_clear()
+    ffmpeg_probe.get_capabilities(path)
+    assert calls == [path, path]
@@ -1,5 +1,73 @@
 import pytest
 
+from screen_recorder.core.recorder import Recorder
+
+
 def test_dummy():
     """Test básico para verificar que pytest detecta los tests."""
     assert True
+
+
+@pytest.fixture
+def recorder():
+    """Recorder sin inicializar (no busca FFmpeg ni dispositivos de audio)."""
+    rec = Recorder.__new__(Recorder)
+    rec.config = {}
+    rec._cmd_prefix = None
+    rec._cmd_prefix_key = None
+    return rec
+
+
+@pytest.mark.parametrize("key, value", [
+    ('framerate', 60),
+    ('video_size', '1280x720'),
+    ('linux_capture', 'kmsgrab'),
+    ('windows_capture', 'ddagrab'),
+    ('video_codec', 'libx265'),
+    ('crf', '23'),
+    ('preset', 'veryfast'),
+    ('tune', 'film'),
+    ('pixfmt', 'yuv444p'),
+    ('gop', 120),
+    ('bframes', 2),
+    ('refs', 3),
+])
+def test_cmd_cache_key_cambia_con_la_config(recorder, key, value):
+    """Cada ajuste que afecta al comando forma parte de la clave de caché."""
+    before = recorder._cmd_cache_key()
+    recorder.config[key] = value
+    assert recorder._cmd_cache_key() != before
+
+
+def test_invalidate_cmd_cache_descarta_codec_y_sus_args(recorder):
+    """invalidate_cmd_cache también descarta video_codec y _codec_args."""
+    recorder._cmd_prefix = ('ffmpeg',)
+    recorder._cmd_prefix_key = recorder._cmd_cache_key()
+    recorder.__dict__['video_codec'] = 'h264_nvenc'
+    recorder.__dict__['_codec_args'] = ('-c:v', 'h264_nvenc')
+
+    recorder.invalidate_cmd_cache()
+
+    assert recorder._cmd_prefix is None
+    assert recorder._cmd_prefix_key is None
+    assert 'video_codec' not in recorder.__dict__
+    assert '_codec_args' not in recorder.__dict__
+
+
+def test_prefijo_se_reconstruye_al_cambiar_la_config(recorder, monkeypatch):
+    """Un cambio de config detectado por la clave reconstruye el comando."""
+    def build():
+        recorder._cmd_prefix_key = recorder._cmd_cache_key()
+        recorder._cmd_prefix = ('ffmpeg', '-crf', recorder.config.get('crf', '18'))
+        return recorder._cmd_prefix
+
+    monkeypatch.setattr(recorder, '_build_static_cmd_prefix', build)
+    recorder.__dict__['video_codec'] = 'libx264'
+
+    first = recorder._get_platform_cmd_args('salida.mkv')
+    assert first[:3] == ('ffmpeg', '-crf', '18')
+    assert recorder._get_platform_cmd_args('otra.mkv')[:3] == first[:3]
+
+    recorder.config['crf'] = '28'
+    assert recorder._get_platform_cmd_args('salida.mkv')[:3] == ('ffmpeg', '-crf', '28')
+    assert 'video_codec' not in recorder.__dict__